@@ -14,13 +14,11 @@
 # Você deve ter recebido uma cópia da Licença Pública Geral GNU
 # junto com este programa; se não, veja <https://www.gnu.org/licenses/>.
 
-import os
-from PyQt5 import uic
 from PyQt5 import QtWidgets
+from pFillGapUi import formulario
 
-# This loads your .ui file so that PyQt can populate your plugin with the elements from Qt Designer
-FORM_CLASS, _ = uic.loadUiType(os.path.join(
-    os.path.dirname(__file__), 'pFillGapDialog.ui'))
+# Form class compiled from the .ui at build time (falls back to parsing the .ui with uic)
+FORM_CLASS = formulario('pFillGapDialog.ui')
 
 
 class pFillGapDialog(QtWidgets.QDialog, FORM_CLASS):
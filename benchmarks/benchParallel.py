@@ -0,0 +1,74 @@
+# pFillGaps
+# Copyright (C) [2024] [Cláudio Bielenki Jr]
+#
+# Este programa é software livre; você pode redistribuí-lo e/ou
+# modificá-lo sob os termos da Licença Pública Geral GNU,
+# conforme publicada pela Free Software Foundation; tanto a versão 3
+# da Licença, ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM NENHUMA GARANTIA; nem mesmo a garantia implícita de
+# COMERCIABILIDADE OU ADEQUAÇÃO A UM PROPÓSITO ESPECÍFICO. Consulte a
+# Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU
+# junto com este programa; se não, veja <https://www.gnu.org/licenses/>.
+
+"""Escalonamento do preenchimento paralelo com o número de processos.
+
+Exemplo:
+    python benchmarks/benchParallel.py --stations 400 --days 10000 --max-workers 8
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from pFillGapCore import FillGapsEngine
+from redeSintetica import gerarCoordenadas, gerarSeries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", type=int, default=200)
+    parser.add_argument("--days", type=int, default=5000)
+    parser.add_argument("--gaps", type=float, default=0.1, help="fração de falhas")
+    parser.add_argument("--method", default="Correlation")
+    parser.add_argument("--distance", type=float, default=150000)
+    parser.add_argument("--max-gauges", type=int, default=5)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    dataPlu = gerarSeries(args.stations, args.days, args.gaps)
+    engine = FillGapsEngine().fit(dataPlu, coords=gerarCoordenadas(args.stations))
+    nFalhas = int(dataPlu.isna().to_numpy().sum())
+    print(f"{args.stations} postos x {args.days} dias, {nFalhas} falhas, método {args.method}")
+    print(f"{'workers':>8} {'tempo (s)':>10} {'falhas/s':>12} {'speedup':>8}")
+    workers = 1
+    base = None
+    referencia = None
+    while workers <= args.max_workers:
+        tempos = []
+        for _ in range(args.repeat):
+            inicio = time.perf_counter()
+            df = engine.fill(args.method, args.distance, args.max_gauges, workers=workers)
+            tempos.append(time.perf_counter() - inicio)
+        tempo = min(tempos)
+        if referencia is None:
+            referencia = df
+            base = tempo
+        elif not referencia.equals(df):
+            raise AssertionError(f"Resultado com {workers} processos difere do serial")
+        print(f"{workers:>8} {tempo:>10.3f} {nFalhas / tempo:>12.0f} {base / tempo:>8.2f}")
+        workers *= 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+# pFillGaps
+# Copyright (C) [2024] [Cláudio Bielenki Jr]
+#
+# Este programa é software livre; você pode redistribuí-lo e/ou
+# modificá-lo sob os termos da Licença Pública Geral GNU,
+# conforme publicada pela Free Software Foundation; tanto a versão 3
+# da Licença, ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM NENHUMA GARANTIA; nem mesmo a garantia implícita de
+# COMERCIABILIDADE OU ADEQUAÇÃO A UM PROPÓSITO ESPECÍFICO. Consulte a
+# Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU
+# junto com este programa; se não, veja <https://www.gnu.org/licenses/>.
+
+"""Tempo e memória de cada etapa do preenchimento em redes sintéticas.
+
+Reproduz as etapas de upDate/pFalhas/salvarCSV (leitura do CSV, leitura e
+reprojeção do shapefile, estatísticas, índice espacial, vizinhos no raio,
+preenchimento por método e gravação do CSV e do log) para cada combinação
+de número de postos, número de dias e CRS do shapefile.
+
+Exemplos:
+    python benchmarks/benchPipeline.py --stations 50 500 5000 --days 1000 100000
+    python benchmarks/benchPipeline.py --json atual.json --baseline base.json --tolerance 0.2
+
+Com --baseline o script termina com código 1 se alguma etapa ficar mais
+lenta que a referência além da tolerância, servindo de teste de regressão.
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from pFillGapCore import METODOS, FillGapsEngine, coordenadasPostos, lerPostos
+from pFillGapIO import lerDados
+from pFillGapSpatial import VizinhancaPostos
+from pFillGapStats import correlacaoPareada
+from redeSintetica import gerarCoordenadas, gerarSeries, gravarShapefile
+
+# Etapas com tempo abaixo disso não entram no teste de regressão (ruído de medida)
+TEMPO_MINIMO = 0.05
+
+
+def medir(funcao, repeat, memoria):
+    """Menor tempo entre `repeat` execuções e pico de memória (MiB) de uma delas"""
+    tempos = []
+    for _ in range(repeat):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    pico = None
+    if memoria:
+        tracemalloc.start()
+        funcao()
+        pico = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return resultado, min(tempos), pico
+
+
+def executarCaso(nEst, nDias, crs, args, pasta):
+    """Mede as etapas de uma rede; retorna uma lista de registros"""
+    dataPlu = gerarSeries(nEst, nDias, args.gaps, seed=args.seed)
+    coords = gerarCoordenadas(nEst, args.extent, seed=args.seed)
+    fileCSV = pasta / f"rede_{nEst}_{nDias}.csv"
+    if not fileCSV.exists():
+        dataPlu.to_csv(fileCSV)
+    nFalhas = int(np.isnan(dataPlu.to_numpy()).sum())
+    registros = []
+
+    def registrar(etapa, tempo, pico, falhas=None):
+        registro = {"stations": nEst, "days": nDias, "crs": crs, "stage": etapa,
+                    "seconds": tempo, "peak_mb": pico}
+        if falhas:
+            registro["gaps"] = falhas
+            registro["gaps_per_s"] = falhas / tempo if tempo > 0 else None
+        registros.append(registro)
+
+    def lerCSV():
+        dados = lerDados(str(fileCSV))
+        dados.set_index("Data", inplace=True)
+        return dados
+
+    dataPlu, tempo, pico = medir(lerCSV, args.repeat, args.memory)
+    registrar("csv", tempo, pico)
+
+    if crs != "none":
+        shapefile = pasta / f"postos_{nEst}_{crs}.shp"
+        if not shapefile.exists():
+            gravarShapefile(coords, dataPlu.columns, str(shapefile), geografico=(crs == "geo"))
+        coords, tempo, pico = medir(lambda: coordenadasPostos(lerPostos(str(shapefile), "codigo"),
+                                                              dataPlu.columns),
+                                    args.repeat, args.memory)
+        registrar("reprojecao", tempo, pico)
+
+    def estatisticas():
+        return {"means": dataPlu.mean().to_numpy(dtype=float),
+                "stds": dataPlu.std().to_numpy(dtype=float),
+                "arrayCorr": correlacaoPareada(dataPlu.to_numpy(dtype=float))[0]}
+
+    estat, tempo, pico = medir(estatisticas, args.repeat, args.memory)
+    registrar("correlacao", tempo, pico)
+
+    def indice():
+        vizinhanca = VizinhancaPostos(coords)
+        vizinhanca.maxDist
+        return vizinhanca
+
+    vizinhanca, tempo, pico = medir(indice, args.repeat, args.memory)
+    registrar("distancias", tempo, pico)
+    _, tempo, pico = medir(lambda: vizinhanca.raio(args.distance), args.repeat, args.memory)
+    registrar("vizinhos", tempo, pico)
+
+    engine = FillGapsEngine().fit(dataPlu, coords=coords, estatisticas=estat)
+    referencia = None
+    for method in args.methods:
+        df, tempo, pico = medir(lambda: engine.fill(method, args.distance, args.max_gauges,
+                                                     workers=args.workers),
+                                args.repeat, args.memory)
+        registrar(f"preenchimento_{method}", tempo, pico, nFalhas)
+        referencia = df
+    if referencia is not None:
+        saida = pasta / f"rede_{nEst}_{nDias}_Fill.csv"
+        _, tempo, pico = medir(lambda: engine.salvar(str(saida)), args.repeat, args.memory)
+        registrar("gravacao", tempo, pico)
+    return registros
+
+
+def compararBase(registros, arquivoBase, tolerancia):
+    """Etapas mais lentas que a referência por mais de `tolerancia` (fração)"""
+    with open(arquivoBase) as f:
+        base = {(r["stations"], r["days"], r["crs"], r["stage"]): r["seconds"]
+                for r in json.load(f)["results"]}
+    regressoes = []
+    for r in registros:
+        anterior = base.get((r["stations"], r["days"], r["crs"], r["stage"]))
+        if anterior is None or max(anterior, r["seconds"]) < TEMPO_MINIMO:
+            continue
+        if r["seconds"] > anterior * (1 + tolerancia):
+            regressoes.append((r, anterior))
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", type=int, nargs="+", default=[50, 500])
+    parser.add_argument("--days", type=int, nargs="+", default=[1000])
+    parser.add_argument("--crs", nargs="+", choices=("geo", "utm", "none"), default=["geo", "utm"],
+                        help="CRS do shapefile; 'none' usa as coordenadas sem shapefile")
+    parser.add_argument("--methods", nargs="+", choices=METODOS, default=list(METODOS))
+    parser.add_argument("--gaps", type=float, default=0.1, help="fração de falhas")
+    parser.add_argument("--extent", type=float, default=500000.0, help="lado da região (m)")
+    parser.add_argument("--distance", type=float, default=150000)
+    parser.add_argument("--max-gauges", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="não mede o pico de memória (execução extra com tracemalloc)")
+    parser.add_argument("--workdir", help="pasta dos arquivos gerados (padrão: temporária)")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    parser.add_argument("--baseline", help="resultados de referência (--json de outra execução)")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="aumento de tempo tolerado em relação à referência")
+    args = parser.parse_args(argv)
+
+    temporaria = None
+    if args.workdir:
+        pasta = Path(args.workdir)
+        pasta.mkdir(parents=True, exist_ok=True)
+    else:
+        temporaria = tempfile.TemporaryDirectory(prefix="pFillGapsBench")
+        pasta = Path(temporaria.name)
+
+    registros = []
+    print(f"{'postos':>7} {'dias':>7} {'crs':>4} {'etapa':<26} {'tempo (s)':>10} "
+          f"{'pico (MiB)':>11} {'falhas/s':>12}")
+    try:
+        for nEst in args.stations:
+            for nDias in args.days:
+                for crs in args.crs:
+                    for r in executarCaso(nEst, nDias, crs, args, pasta):
+                        registros.append(r)
+                        pico = f"{r['peak_mb']:.1f}" if r["peak_mb"] is not None else "-"
+                        taxa = f"{r['gaps_per_s']:.0f}" if r.get("gaps_per_s") else "-"
+                        print(f"{nEst:>7} {nDias:>7} {crs:>4} {r['stage']:<26} "
+                              f"{r['seconds']:>10.3f} {pico:>11} {taxa:>12}")
+    finally:
+        if temporaria is not None:
+            temporaria.cleanup()
+
+    rss = None
+    if resource is not None:
+        # ru_maxrss em KiB no Linux e em bytes no macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        rss /= 2 ** 20 if sys.platform == "darwin" else 2 ** 10
+        print(f"Pico de memória do processo: {rss:.0f} MiB")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "max_rss_mb": rss, "results": registros}, f, indent=1)
+
+    if args.baseline:
+        regressoes = compararBase(registros, args.baseline, args.tolerance)
+        for r, anterior in regressoes:
+            print(f"REGRESSÃO {r['stations']}x{r['days']} {r['crs']} {r['stage']}: "
+                  f"{r['seconds']:.3f}s (referência {anterior:.3f}s)")
+        if regressoes:
+            return 1
+        print("Sem regressões em relação à referência.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
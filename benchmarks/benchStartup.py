@@ -0,0 +1,115 @@
+# pFillGaps
+# Copyright (C) [2024] [Cláudio Bielenki Jr]
+#
+# Este programa é software livre; você pode redistribuí-lo e/ou
+# modificá-lo sob os termos da Licença Pública Geral GNU,
+# conforme publicada pela Free Software Foundation; tanto a versão 3
+# da Licença, ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM NENHUMA GARANTIA; nem mesmo a garantia implícita de
+# COMERCIABILIDADE OU ADEQUAÇÃO A UM PROPÓSITO ESPECÍFICO. Consulte a
+# Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU
+# junto com este programa; se não, veja <https://www.gnu.org/licenses/>.
+
+"""Tempo de abertura do programa (importação do pFillGapMain e criação da janela).
+
+Cada repetição roda num processo Python novo, com a plataforma "offscreen"
+do Qt, e mede a importação do pFillGapMain, a criação da QApplication e a da
+janela principal. Também lista os módulos pesados (NumPy, pandas, GDAL,
+geopandas, pyproj) carregados até a janela aparecer, que devem ficar para
+a primeira ação que os usa.
+
+Exemplos:
+    python benchmarks/benchStartup.py --repeat 5
+    python benchmarks/benchStartup.py --json atual.json --baseline base.json --tolerance 0.2
+
+Com --baseline o script termina com código 1 se alguma etapa ficar mais
+lenta que a referência além da tolerância, ou se um módulo pesado passar a
+ser importado na abertura.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+PASTA = Path(__file__).resolve().parent.parent
+MODULOS_PESADOS = ("numpy", "pandas", "osgeo", "geopandas", "pyproj", "scipy")
+# Etapas com tempo abaixo disso não entram no teste de regressão (ruído de medida)
+TEMPO_MINIMO = 0.05
+
+# Executado em cada processo filho; imprime um JSON com os tempos
+_SCRIPT = """
+import json, sys, time
+inicio = time.perf_counter()
+import pFillGapMain
+importacao = time.perf_counter()
+app = pFillGapMain.QApplication(sys.argv)
+aplicacao = time.perf_counter()
+window = pFillGapMain.pyFillGaps()
+window.show()
+app.processEvents()
+janela = time.perf_counter()
+print(json.dumps({"importacao": importacao - inicio, "qapplication": aplicacao - importacao,
+                  "janela": janela - aplicacao, "total": janela - inicio,
+                  "modulos": sorted(m for m in %r if m in sys.modules)}))
+""" % (MODULOS_PESADOS,)
+
+
+def medirAbertura():
+    """Tempos de uma abertura num processo novo"""
+    ambiente = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    saida = subprocess.run([sys.executable, "-c", _SCRIPT], cwd=PASTA, env=ambiente,
+                           capture_output=True, text=True, check=True)
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    parser.add_argument("--baseline", help="resultados de referência (--json de outra execução)")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="aumento de tempo tolerado em relação à referência")
+    args = parser.parse_args(argv)
+
+    execucoes = [medirAbertura() for _ in range(args.repeat)]
+    etapas = ("importacao", "qapplication", "janela", "total")
+    # Menor tempo de cada etapa entre as repetições
+    resultado = {etapa: min(e[etapa] for e in execucoes) for etapa in etapas}
+    modulos = sorted({m for e in execucoes for m in e["modulos"]})
+    for etapa in etapas:
+        print(f"{etapa:<14} {resultado[etapa]:>8.3f} s")
+    print("Módulos pesados na abertura: " + (", ".join(modulos) or "nenhum"))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": resultado, "modules": modulos}, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            base = json.load(f)
+        regressoes = False
+        for etapa in etapas:
+            anterior = base["results"].get(etapa)
+            if anterior is None or max(anterior, resultado[etapa]) < TEMPO_MINIMO:
+                continue
+            if resultado[etapa] > anterior * (1 + args.tolerance):
+                print(f"REGRESSÃO {etapa}: {resultado[etapa]:.3f}s (referência {anterior:.3f}s)")
+                regressoes = True
+        novos = sorted(set(modulos) - set(base.get("modules", [])))
+        if novos:
+            print("REGRESSÃO: módulos pesados importados na abertura: " + ", ".join(novos))
+            regressoes = True
+        if regressoes:
+            return 1
+        print("Sem regressões em relação à referência.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# pFillGaps
+# Copyright (C) [2024] [Cláudio Bielenki Jr]
+#
+# Este programa é software livre; você pode redistribuí-lo e/ou
+# modificá-lo sob os termos da Licença Pública Geral GNU,
+# conforme publicada pela Free Software Foundation; tanto a versão 3
+# da Licença, ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM NENHUMA GARANTIA; nem mesmo a garantia implícita de
+# COMERCIABILIDADE OU ADEQUAÇÃO A UM PROPÓSITO ESPECÍFICO. Consulte a
+# Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU
+# junto com este programa; se não, veja <https://www.gnu.org/licenses/>.
+
+"""Redes sintéticas de postos pluviométricos para os benchmarks."""
+
+import numpy as np
+import pandas as pd
+
+
+def gerarCoordenadas(nEst, extensao=500000.0, seed=0):
+    """Coordenadas UTM (metros) aleatórias dentro de um quadrado de lado `extensao`"""
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0, extensao, size=(nEst, 2))
+
+
+def gerarSeries(nEst, nDias, fracFalhas=0.1, seed=0):
+    """Séries diárias correlacionadas: sinal regional comum mais ruído de cada posto.
+
+    Cerca de `fracFalhas` das células são removidas (NaN) ao acaso.
+    """
+    rng = np.random.default_rng(seed)
+    regional = rng.gamma(0.6, 8.0, size=(nDias, 1))
+    fator = rng.uniform(0.5, 1.5, size=(1, nEst))
+    dados = regional * fator + rng.gamma(0.4, 2.0, size=(nDias, nEst))
+    dados[rng.random((nDias, nEst)) < fracFalhas] = np.nan
+    datas = pd.date_range("1990-01-01", periods=nDias, freq="D").strftime("%Y-%m-%d")
+    dataPlu = pd.DataFrame(dados, index=pd.Index(datas, name="Data"),
+                           columns=[f"P{i:05d}" for i in range(nEst)])
+    return dataPlu
+
+
+def matrizDistancias(coords):
+    """Matriz densa de distâncias euclidianas entre as coordenadas"""
+    dx = coords[:, None, 0] - coords[None, :, 0]
+    dy = coords[:, None, 1] - coords[None, :, 1]
+    return np.sqrt(dx * dx + dy * dy)
+
+
+# Zona UTM 23S (WGS 84) usada para posicionar as redes sintéticas em coordenadas reais
+EPSG_UTM = 32723
+ORIGEM_UTM = (250000.0, 7300000.0)
+
+
+def gravarShapefile(coords, codigos, arquivo, geografico=False, campo="codigo"):
+    """Grava os postos como pontos num shapefile, em UTM 23S ou em lon/lat (WGS 84).
+
+    `coords` são as coordenadas de gerarCoordenadas, deslocadas para dentro
+    da zona UTM; `codigos` vão no campo `campo`, na ordem das colunas.
+    """
+    import geopandas as gpd
+    gagePlu = gpd.GeoDataFrame(
+        {campo: list(codigos)},
+        geometry=gpd.points_from_xy(coords[:, 0] + ORIGEM_UTM[0], coords[:, 1] + ORIGEM_UTM[1]),
+        crs=f"EPSG:{EPSG_UTM}")
+    if geografico:
+        gagePlu = gagePlu.to_crs("EPSG:4326")
+    gagePlu.to_file(arquivo)
+    return arquivo
@@ -0,0 +1,305 @@
+# pFillGaps
+# Copyright (C) [2024] [Cláudio Bielenki Jr]
+#
+# Este programa é software livre; você pode redistribuí-lo e/ou
+# modificá-lo sob os termos da Licença Pública Geral GNU,
+# conforme publicada pela Free Software Foundation; tanto a versão 3
+# da Licença, ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM NENHUMA GARANTIA; nem mesmo a garantia implícita de
+# COMERCIABILIDADE OU ADEQUAÇÃO A UM PROPÓSITO ESPECÍFICO. Consulte a
+# Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU
+# junto com este programa; se não, veja <https://www.gnu.org/licenses/>.
+
+"""Compara o preenchimento vetorizado com o laço original de pFalhas.
+
+Em redes aleatórias pequenas, preencherFalhas(agrupar=False) deve
+reproduzir bit a bit os valores e o log do laço original (cópia abaixo,
+com os atributos da janela trocados por argumentos) sempre que a seleção
+original é bem definida: índices de seleção distintos e positivos. Com
+empates ou índices negativos o laço original escolhe doadores errados (a
+busca por valor devolve a primeira ocorrência e postos sem dado, com
+índice zero, passam à frente dos negativos); esses casos são contados,
+não comparados. Também verifica que agrupar=True escolhe os mesmos
+doadores, com valores iguais a menos de arredondamento, e que a correlação
+de pFillGapStats coincide com DataFrame.corr, inclusive o NaN de postos
+constantes nas linhas comuns (que não podem virar doadores), e que numa
+série longa (9 milhões de linhas) a correlação em float32 continua definida
+e próxima da de float64. Por fim compara o preenchimento de
+FillGapsEngine em float32 e float64 em redes sintéticas, com a tolerância
+documentada em FillGapsEngine.fit (TOLERANCIA_FLOAT32).
+
+Exemplo:
+    python benchmarks/verificarLegado.py --trials 300
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import numpy as np
+import pandas as pd
+
+from pFillGapCore import METODOS, TOLERANCIA_FLOAT32, FillGapsEngine, preencherFalhas
+from pFillGapLog import LogDoadores
+from pFillGapStats import correlacaoPareada
+from redeSintetica import gerarCoordenadas, gerarSeries
+
+# Redes (postos, dias) da comparação float32 x float64
+REDES_FLOAT32 = ((60, 3000), (200, 5000), (100, 20000))
+
+
+def pFalhasLegado(arrayData, arrayCorr, arrayDist, means, stds, maxEst, method, colNames, indexLista):
+    """Laço de pFillGapMain.pFalhas da versão original, com `self.` trocado por argumentos.
+
+    `arrayDist` é o inverso da distância zerado fora do raio; `colNames`
+    inclui a coluna de datas na primeira posição, como na janela.
+    """
+    columns = arrayData.shape[1]
+    rows = arrayData.shape[0]
+    arrayIndices = np.multiply(arrayCorr, arrayDist)
+    arrayDataP = np.copy(arrayData)
+    preenchimento = {}
+    for col in range(columns):
+        pMeans = means[col]
+        pStds = stds[col]
+        for row in range(rows):
+            if np.isnan(arrayData[row, col]):
+                chavePreencimento = (indexLista[row], colNames[col+1])
+                estPreenchimento = []
+                rowData = np.empty(shape=columns)
+                arrayPMedia = np.empty(shape=columns)
+                arrayPStds = np.empty(shape=columns)
+                arrayPCorr = np.empty(shape=columns)
+                arrayPIndices = np.empty(shape=columns)
+                arrayPDist = np.empty(shape=columns)
+                precX = 0
+                for i in range(columns):
+                    if not np.isnan(arrayData[row, i]):
+                        rowData[i] = arrayData[row, i]
+                        arrayPMedia[i] = means[i]
+                        arrayPStds[i] = stds[i]
+                        arrayPCorr[i] = arrayCorr[col, i]
+                        arrayPIndices[i] = arrayIndices[col, i]
+                        arrayPDist[i] = arrayDist[col, i]
+                    else:
+                        rowData[i] = 0
+                        arrayPMedia[i] = 0
+                        arrayPStds[i] = 0
+                        arrayPCorr[i] = 0
+                        arrayPIndices[i] = 0
+                        arrayPDist[i] = 0
+                arrayPIndicesCopy = np.copy(arrayPIndices)
+                arraySortIndices = np.sort(arrayPIndicesCopy)
+                countNZeros = np.count_nonzero(~np.isnan(arraySortIndices) & (arraySortIndices != 0))
+                if countNZeros == 0:
+                    estPreenchimento.append("Não preenchido")
+                    preenchimento[chavePreencimento] = estPreenchimento
+                    continue
+                estValidas = min(maxEst, countNZeros)
+                arraySelecao = arraySortIndices[-(estValidas):]
+                for item in arraySelecao:
+                    position = np.where(arrayPIndices == item)[0][0]
+                    estPreenchimento.append(colNames[position+1])
+                    if method == "Mean":
+                        precX = precX + ((1 / estValidas) * ((pMeans / arrayPMedia[position]) * rowData[position]))
+                    if method == "Correlation":
+                        precX = precX + ((pStds / estValidas) * (
+                                    ((rowData[position] - arrayPMedia[position]) / arrayPStds[position]) *
+                                    arrayPCorr[position]))
+                    if method == "InvDist":
+                        somaDist = 0
+                        for item2 in arraySelecao:
+                            position2 = np.where(arrayPIndicesCopy == item2)[0][0]
+                            somaDist = somaDist + arrayPDist[position2]
+                        precX = precX + ((arrayPDist[position] / somaDist) * rowData[position])
+                if method == "Mean":
+                    arrayDataP[row, col] = precX
+                if method == "Correlation":
+                    arrayDataP[row, col] = precX + pMeans
+                if method == "InvDist":
+                    arrayDataP[row, col] = precX
+                preenchimento[chavePreencimento] = estPreenchimento
+    return arrayDataP, preenchimento
+
+
+def redeAleatoria(rng):
+    """Dados, correlação, pesos de distância, médias e desvios de uma rede pequena"""
+    nEst = int(rng.integers(2, 12))
+    nDias = int(rng.integers(5, 80))
+    regional = rng.gamma(1, 5, (nDias, 1))
+    arrayData = regional * rng.uniform(0.5, 1.5, (1, nEst)) + rng.gamma(1, 1, (nDias, nEst))
+    arrayData[rng.random((nDias, nEst)) < rng.uniform(0.05, 0.5)] = np.nan
+    dataPlu = pd.DataFrame(arrayData)
+    coords = rng.uniform(0, 100000, (nEst, 2))
+    matrixDist = np.sqrt(((coords[:, None] - coords[None]) ** 2).sum(-1))
+    raio = rng.choice([30000, 60000, 200000])
+    with np.errstate(divide="ignore"):
+        arrayDist = np.multiply(1 / matrixDist, np.where(matrixDist > raio, 0, 1))
+    return (arrayData, dataPlu.corr().to_numpy(), arrayDist, dataPlu.mean().to_numpy(),
+            dataPlu.std().to_numpy())
+
+
+def selecaoDefinida(arrayCorr, arrayDist):
+    """Índices de seleção positivos e distintos (fora da diagonal), onde o laço original é exato"""
+    with np.errstate(invalid="ignore"):
+        indices = np.multiply(arrayCorr, arrayDist)
+    for col in range(indices.shape[0]):
+        linha = np.delete(indices[col], col)
+        linha = linha[linha != 0]
+        if np.isnan(linha).any() or (linha < 0).any() or np.unique(linha).size != linha.size:
+            return False
+    return True
+
+
+def redeConstante(rng):
+    """Rede em que um posto é constante (0 mm ou outro valor) nas linhas em que outro tem dado"""
+    nEst = int(rng.integers(2, 8))
+    nDias = int(rng.integers(10, 3000))
+    arrayData = rng.gamma(1, 5, (nDias, nEst))
+    arrayData[rng.random((nDias, nEst)) < 0.1] = np.nan
+    constante, outro = rng.choice(nEst, 2, replace=False)
+    comuns = rng.random(nDias) < 0.5
+    arrayData[comuns, constante] = rng.choice([0.0, 0.1, 2.7, 13.3])
+    arrayData[~comuns, outro] = np.nan
+    return arrayData
+
+
+def verificarCorrelacao(trials, seed):
+    """Divergências entre correlacaoPareada e DataFrame.corr em redes aleatórias"""
+    rng = np.random.default_rng(seed)
+    falhas = []
+    for trial in range(trials):
+        for nome, arrayData in (("rede", redeAleatoria(rng)[0]), ("rede constante", redeConstante(rng))):
+            esperada = pd.DataFrame(arrayData).corr().to_numpy()
+            for dtype, tolerancia in ((np.float64, 1e-10), (np.float32, 1e-4)):
+                corr, _ = correlacaoPareada(arrayData, dtype)
+                caso = f"{nome} {trial}, {np.dtype(dtype).name}"
+                if not np.array_equal(np.isnan(corr), np.isnan(esperada)):
+                    falhas.append(f"{caso}: pares sem correlação diferentes de DataFrame.corr")
+                elif not np.allclose(corr, esperada, rtol=0, atol=tolerancia, equal_nan=True):
+                    falhas.append(f"{caso}: correlação difere de DataFrame.corr")
+    return falhas
+
+
+def verificarSerieLonga(seed, nLinhas=9_000_000):
+    """Divergências de correlacaoPareada em float32 numa série com mais de 1/eps32 linhas.
+
+    Os postos 0 a 2 são correlacionados; o posto 3 é constante na segunda
+    metade, a única em que o posto 2 tem dado, e o par (2, 3) deve ficar sem
+    correlação.
+    """
+    rng = np.random.default_rng(seed)
+    arrayData = rng.gamma(1, 5, (nLinhas, 1)) + rng.gamma(1, 1, (nLinhas, 4))
+    metade = nLinhas // 2
+    arrayData[metade:, 3] = 2.7
+    arrayData[:metade, 2] = np.nan
+    corr64, _ = correlacaoPareada(arrayData)
+    corr32, _ = correlacaoPareada(arrayData, np.float32)
+    semCorrelacao = np.zeros((4, 4), dtype=bool)
+    semCorrelacao[2, 3] = semCorrelacao[3, 2] = True
+    falhas = []
+    for nome, corr in (("float64", corr64), ("float32", corr32)):
+        if not np.array_equal(np.isnan(corr), semCorrelacao):
+            falhas.append(f"série longa, {nome}: pares sem correlação {np.argwhere(np.isnan(corr)).tolist()}")
+    if not np.allclose(corr32, corr64, rtol=0, atol=1e-5, equal_nan=True):
+        falhas.append("série longa: float32 difere de float64 além de 1e-5")
+    return falhas
+
+
+def verificarFloat32(seed, distancia=150000, maxEst=5):
+    """Divergências entre o preenchimento em float32 e em float64 além de TOLERANCIA_FLOAT32.
+
+    A diferença é medida relativa a max(|valor|, desvio padrão do posto),
+    nas falhas em que as duas precisões escolhem os mesmos doadores.
+    Retorna as divergências e a maior diferença encontrada.
+    """
+    falhas = []
+    maior = 0.0
+    for nEst, nDias in REDES_FLOAT32:
+        dataPlu = gerarSeries(nEst, nDias, 0.1, seed=seed)
+        coords = gerarCoordenadas(nEst, seed=seed)
+        engine64 = FillGapsEngine().fit(dataPlu, coords=coords)
+        engine32 = FillGapsEngine().fit(dataPlu, coords=coords, dtype=np.float32)
+        desvios = dataPlu.std().to_numpy()
+        for method in METODOS:
+            valores64 = engine64.fill(method, distancia, maxEst).iloc[:, 1:].to_numpy(dtype=float)
+            valores32 = engine32.fill(method, distancia, maxEst).iloc[:, 1:].to_numpy(dtype=float)
+            mesmos = (engine64.log.doadores == engine32.log.doadores).all(axis=1)
+            rows, cols = engine64.log.linhas[mesmos], engine64.log.postos[mesmos]
+            x64, x32 = valores64[rows, cols], valores32[rows, cols]
+            with np.errstate(invalid="ignore"):
+                diferenca = np.abs(x32 - x64) / np.maximum(np.abs(x64), desvios[cols])
+            if not np.array_equal(np.isnan(x32), np.isnan(x64)):
+                falhas.append(f"float32 {nEst}x{nDias}, {method}: falhas preenchidas diferentes")
+                continue
+            if diferenca.size and not np.isnan(diferenca).all():
+                maior = max(maior, float(np.nanmax(diferenca)))
+                if np.nanmax(diferenca) > TOLERANCIA_FLOAT32:
+                    falhas.append(f"float32 {nEst}x{nDias}, {method}: diferença "
+                                  f"{np.nanmax(diferenca):.1e} acima de {TOLERANCIA_FLOAT32:.0e}")
+    return falhas, maior
+
+
+def verificar(trials, seed):
+    rng = np.random.default_rng(seed)
+    comparadas = ignoradas = 0
+    falhas = []
+    for trial in range(trials):
+        arrayData, arrayCorr, arrayDist, means, stds = redeAleatoria(rng)
+        nEst = arrayData.shape[1]
+        colNames = ["Data"] + [f"P{i}" for i in range(nEst)]
+        indexLista = list(range(arrayData.shape[0]))
+        definida = selecaoDefinida(arrayCorr, arrayDist)
+        for method in METODOS:
+            for maxEst in sorted({1, 2, 3, nEst}):
+                exato = preencherFalhas(arrayData, arrayCorr, arrayDist, means, stds, maxEst,
+                                        method, blockSize=7, agrupar=False)
+                agrupado = preencherFalhas(arrayData, arrayCorr, arrayDist, means, stds, maxEst,
+                                           method, agrupar=True)
+                caso = f"rede {trial}, {method}, maxEst={maxEst}"
+                if not np.array_equal(exato[3], agrupado[3]):
+                    falhas.append(f"{caso}: agrupar=True escolheu outros doadores")
+                elif not np.allclose(exato[0], agrupado[0], rtol=1e-12, atol=1e-12, equal_nan=True):
+                    falhas.append(f"{caso}: agrupar=True difere além do arredondamento")
+                if not definida:
+                    ignoradas += 1
+                    continue
+                legado, preenchimento = pFalhasLegado(arrayData, arrayCorr, arrayDist, means, stds,
+                                                      maxEst, method, colNames, indexLista)
+                registro = LogDoadores(*exato[1:4], indexLista, colNames[1:]).registro()
+                if not np.array_equal(legado.view(np.int64), exato[0].view(np.int64)):
+                    falhas.append(f"{caso}: valores diferentes do laço original")
+                elif list(preenchimento.items()) != list(registro.items()):
+                    falhas.append(f"{caso}: log diferente do laço original")
+                comparadas += 1
+    return comparadas, ignoradas, falhas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trials", type=int, default=300, help="número de redes aleatórias")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    comparadas, ignoradas, falhas = verificar(args.trials, args.seed)
+    falhasCorrelacao = verificarCorrelacao(args.trials, args.seed) + verificarSerieLonga(args.seed)
+    falhas += falhasCorrelacao
+    falhasFloat32, maiorFloat32 = verificarFloat32(args.seed)
+    falhas += falhasFloat32
+    for falha in falhas[:20]:
+        print(falha)
+    print(f"{comparadas} casos comparados com o laço original, {ignoradas} com empates ou "
+          f"índices negativos não comparados, {len(falhas)} divergências "
+          f"({len(falhasCorrelacao)} na correlação, {len(falhasFloat32)} em float32; maior "
+          f"diferença float32/float64 de {maiorFloat32:.1e} do valor ou do desvio do posto).")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
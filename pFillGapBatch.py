@@ -0,0 +1,192 @@
+# pFillGaps
+# Copyright (C) [2024] [Cláudio Bielenki Jr]
+#
+# Este programa é software livre; você pode redistribuí-lo e/ou
+# modificá-lo sob os termos da Licença Pública Geral GNU,
+# conforme publicada pela Free Software Foundation; tanto a versão 3
+# da Licença, ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM NENHUMA GARANTIA; nem mesmo a garantia implícita de
+# COMERCIABILIDADE OU ADEQUAÇÃO A UM PROPÓSITO ESPECÍFICO. Consulte a
+# Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU
+# junto com este programa; se não, veja <https://www.gnu.org/licenses/>.
+
+"""Preenchimento de várias bacias numa só execução, a partir de um manifesto.
+
+O manifesto é um CSV (uma linha por bacia) ou um JSON ({"defaults": {...},
+"jobs": [{...}, ...]}) com os campos csv, shp, method, distance,
+max_gauges e, opcionalmente, date, code e output. Campos vazios usam os
+valores da linha de comando; caminhos relativos partem da pasta do
+manifesto. As bacias são distribuídas entre processos que carregam o
+GDAL/PROJ uma vez e reaproveitam as consultas de zona UTM entre bacias. O
+resumo (tempo por etapa, falhas e taxa de preenchimento de cada bacia) é
+gravado em <manifesto>_resumo.csv.
+
+Exemplo:
+    python pFillGapBatch.py bacias.csv --method Correlation --distance 50000 \
+        --max-gauges 5 --workers 4
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from pFillGapCore import METODOS, FillGapsEngine, coordenadasPostos, lerPostos
+from pFillGapCache import ajustarComCache
+from pFillGapIO import lerDados
+from pFillGapProfile import Instrumentacao, ativar, desativar
+
+CAMPOS = ("csv", "shp", "method", "distance", "max_gauges", "date", "code", "output")
+# Etapas de primeiro nível resumidas por bacia (prefixo do nome da etapa)
+ETAPAS_RESUMO = ("leitura_dados", "leitura_shapefile", "reprojecao", "fit", "fill", "gravacao")
+
+
+def lerManifesto(arquivo, padroes=None):
+    """Lista de bacias (dicionários com CAMPOS) descritas no manifesto"""
+    arquivo = Path(arquivo)
+    padroes = {k: v for k, v in (padroes or {}).items() if v is not None}
+    if arquivo.suffix.lower() == ".json":
+        with open(arquivo, encoding="utf-8") as file:
+            conteudo = json.load(file)
+        if isinstance(conteudo, list):
+            conteudo = {"jobs": conteudo}
+        padroes.update({k: v for k, v in conteudo.get("defaults", {}).items() if v is not None})
+        linhas = conteudo["jobs"]
+    else:
+        with open(arquivo, newline="", encoding="utf-8") as file:
+            linhas = list(csv.DictReader(file))
+    tarefas = []
+    for numero, linha in enumerate(linhas, 1):
+        tarefa = dict(padroes)
+        tarefa.update({k: v for k, v in linha.items() if v not in (None, "")})
+        desconhecidos = set(tarefa) - set(CAMPOS)
+        if desconhecidos:
+            raise ValueError(f"{arquivo}, bacia {numero}: campos desconhecidos {sorted(desconhecidos)}")
+        for campo in ("csv", "shp", "method", "distance", "max_gauges"):
+            if campo not in tarefa:
+                raise ValueError(f"{arquivo}, bacia {numero}: falta o campo {campo}")
+        if tarefa["method"] not in METODOS:
+            raise ValueError(f"{arquivo}, bacia {numero}: método desconhecido {tarefa['method']}")
+        tarefa["distance"] = float(tarefa["distance"])
+        tarefa["max_gauges"] = int(tarefa["max_gauges"])
+        for campo in ("csv", "shp", "output"):
+            if campo in tarefa:
+                tarefa[campo] = str(arquivo.parent / tarefa[campo])
+        if "output" not in tarefa:
+            fileCSV = Path(tarefa["csv"])
+            tarefa["output"] = str(fileCSV.with_name(fileCSV.stem + "_Fill_" + tarefa["method"] +
+                                                     fileCSV.suffix))
+        tarefas.append(tarefa)
+    return tarefas
+
+
+def _aquecer():
+    """Carrega GDAL/PROJ no processo antes da primeira bacia"""
+    try:
+        from osgeo import ogr  # noqa: F401
+        import pyproj  # noqa: F401
+    except ImportError:
+        # O erro aparece na bacia, com a mensagem da leitura do shapefile
+        pass
+
+
+def executarTarefa(tarefa, usarCache=True):
+    """Preenche uma bacia e retorna a linha do resumo"""
+    instrumentacao = ativar(Instrumentacao())
+    inicio = time.perf_counter()
+    resumo = {"csv": tarefa["csv"], "output": tarefa["output"], "method": tarefa["method"],
+              "distance": tarefa["distance"], "max_gauges": tarefa["max_gauges"]}
+    try:
+        dataPlu = lerDados(tarefa["csv"])
+        indexData = tarefa.get("date") or dataPlu.columns[0]
+        dataPlu.set_index(indexData, inplace=True)
+        if usarCache:
+            engine = ajustarComCache(dataPlu, tarefa["csv"], tarefa["shp"], indexData,
+                                     tarefa.get("code"))
+        else:
+            coords = coordenadasPostos(lerPostos(tarefa["shp"], tarefa.get("code")), dataPlu.columns)
+            engine = FillGapsEngine().fit(dataPlu, coords=coords)
+        engine.fill(tarefa["method"], tarefa["distance"], tarefa["max_gauges"])
+        engine.salvar(tarefa["output"])
+        resumo["status"] = "ok"
+        resumo["error"] = ""
+    except Exception as erro:
+        traceback.print_exc()
+        resumo["status"] = "erro"
+        resumo["error"] = f"{type(erro).__name__}: {erro}"
+    finally:
+        desativar()
+    resumo["seconds"] = time.perf_counter() - inicio
+    for nome in ETAPAS_RESUMO:
+        resumo[f"{nome}_s"] = sum(r["duracao"] for r in instrumentacao.etapas
+                                  if "/" not in r["etapa"] and r["etapa"].startswith(nome))
+    contadores = instrumentacao.contadores
+    falhas = contadores.get("falhas", 0)
+    resumo["gaps"] = falhas
+    resumo["filled"] = contadores.get("falhas_preenchidas", 0)
+    resumo["unfilled"] = contadores.get("falhas_nao_preenchidas", 0)
+    resumo["fill_rate"] = resumo["filled"] / falhas if falhas else None
+    return resumo
+
+
+def executarLote(tarefas, workers=1, usarCache=True):
+    """Executa as bacias em `workers` processos; retorna os resumos na ordem do manifesto"""
+    if workers <= 1:
+        _aquecer()
+        return [executarTarefa(tarefa, usarCache) for tarefa in tarefas]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_aquecer) as executor:
+        return list(executor.map(executarTarefa, tarefas, [usarCache] * len(tarefas)))
+
+
+def salvarResumo(resumos, arquivo):
+    campos = ["csv", "output", "method", "distance", "max_gauges", "status", "seconds"]
+    campos += [f"{nome}_s" for nome in ETAPAS_RESUMO]
+    campos += ["gaps", "filled", "unfilled", "fill_rate", "error"]
+    with open(arquivo, "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=campos)
+        writer.writeheader()
+        writer.writerows(resumos)
+    return arquivo
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="pFillGapBatch",
+                                     description="Preenchimento de falhas de várias bacias")
+    parser.add_argument("manifest", help="manifesto CSV ou JSON com uma bacia por linha")
+    parser.add_argument("--method", choices=METODOS, help="método padrão das bacias")
+    parser.add_argument("--distance", type=float, help="raio padrão, em metros")
+    parser.add_argument("--max-gauges", type=int, help="número máximo de postos padrão")
+    parser.add_argument("--date", help="coluna de datas padrão")
+    parser.add_argument("--code", help="campo padrão com o código dos postos no shapefile")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="bacias processadas ao mesmo tempo (padrão: 1)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="não usa nem grava o cache de estatísticas ao lado de cada CSV")
+    parser.add_argument("--summary", help="arquivo do resumo (padrão: <manifesto>_resumo.csv)")
+    args = parser.parse_args(argv)
+
+    padroes = {"method": args.method, "distance": args.distance, "max_gauges": args.max_gauges,
+               "date": args.date, "code": args.code}
+    try:
+        tarefas = lerManifesto(args.manifest, padroes)
+    except (ValueError, KeyError) as erro:
+        parser.error(str(erro))
+    inicio = time.perf_counter()
+    resumos = executarLote(tarefas, args.workers, usarCache=not args.no_cache)
+    manifesto = Path(args.manifest)
+    arquivo = salvarResumo(resumos, args.summary or manifesto.with_name(manifesto.stem + "_resumo.csv"))
+    erros = sum(r["status"] != "ok" for r in resumos)
+    print(f"{len(resumos)} bacias em {time.perf_counter() - inicio:.1f} s, {erros} com erro. "
+          f"Resumo em {arquivo}.")
+    return 1 if erros else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+# pFillGaps
+# Copyright (C) [2024] [Cláudio Bielenki Jr]
+#
+# Este programa é software livre; você pode redistribuí-lo e/ou
+# modificá-lo sob os termos da Licença Pública Geral GNU,
+# conforme publicada pela Free Software Foundation; tanto a versão 3
+# da Licença, ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM NENHUMA GARANTIA; nem mesmo a garantia implícita de
+# COMERCIABILIDADE OU ADEQUAÇÃO A UM PROPÓSITO ESPECÍFICO. Consulte a
+# Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU
+# junto com este programa; se não, veja <https://www.gnu.org/licenses/>.
+
+"""Preenchimento de falhas em lote, sem interface gráfica.
+
+Exemplo:
+    python pFillGapCLI.py chuva.csv postos.shp --date Data --code Codigo \
+        --method Correlation --distance 50000 --max-gauges 5
+"""
+
+import argparse
+import sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from pFillGapCore import METODOS, FillGapsEngine, coordenadasPostos, lerPostos
+from pFillGapCache import ajustarComCache
+from pFillGapIO import formato, lerDados
+from pFillGapProfile import Instrumentacao, ativar, desativar
+from pFillGapIncremental import (EstadoIncremental, arquivoEstado, preencherIncremental,
+                                 preencherInicial)
+from pFillGapStream import preencherCSV
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="pFillGapCLI",
+                                     description="Preenchimento de falhas em séries de chuva")
+    parser.add_argument("csv", help="séries em CSV, Parquet, Feather ou .npy (postos nas colunas)")
+    parser.add_argument("shp", help="shapefile de pontos com os postos")
+    parser.add_argument("--date", help="coluna de datas do CSV (padrão: primeira coluna)")
+    parser.add_argument("--code", help="campo com o código dos postos no shapefile")
+    parser.add_argument("--method", choices=METODOS, required=True, help="método de preenchimento")
+    parser.add_argument("--distance", type=float, required=True, help="raio de busca dos postos, em metros")
+    parser.add_argument("--max-gauges", type=int, required=True, help="número máximo de postos usados")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processos usados no preenchimento (padrão: 1)")
+    parser.add_argument("--chunksize", type=int,
+                        help="processa o CSV em blocos deste número de linhas, sem carregá-lo inteiro "
+                             "(apenas entrada e saída em CSV)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="preenche só as linhas novas do CSV usando o estado <saída>.estado.npz "
+                             "(criado na primeira execução)")
+    parser.add_argument("--tolerance", type=float, default=1e-3,
+                        help="mudança nas estatísticas que obriga a reestimar falhas antigas "
+                             "no modo incremental (padrão: 1e-3)")
+    parser.add_argument("--min-overlap", type=int, default=2,
+                        help="mínimo de datas com dado nos dois postos para usar um par como "
+                             "doador (padrão: 2)")
+    parser.add_argument("--float32", action="store_true",
+                        help="modo de baixa memória: dados, correlações e distâncias em float32 "
+                             "(diferença para float64 até 1e-5 vezes o maior entre o valor e o "
+                             "desvio padrão do posto; da ordem de 1e-5 mm)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="não usa nem grava o cache de estatísticas ao lado do CSV")
+    parser.add_argument("--text-log", action="store_true",
+                        help="grava também o log em texto (.log) ao lado do log binário .log.npz "
+                             "(com --chunksize e --incremental o log já é só o .log em texto)")
+    parser.add_argument("--weights", action="store_true",
+                        help="inclui no log binário o peso de cada posto doador na estimativa")
+    parser.add_argument("--report", action="store_true",
+                        help="grava o tempo de cada etapa e os contadores em <saída>.tempos.json/.csv")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="inclui no relatório o pico de memória alocada (tracemalloc)")
+    parser.add_argument("--profile", action="store_true",
+                        help="grava também o perfil do cProfile em <saída>.prof (implica --report)")
+    parser.add_argument("--output", help="arquivo de saída; o formato segue a extensão "
+                                         "(padrão: <entrada>_Fill_<método> no formato da entrada)")
+    args = parser.parse_args(argv)
+
+    fileCSV = Path(args.csv)
+    file_path = args.output or fileCSV.with_name(fileCSV.stem + "_Fill_" + args.method + fileCSV.suffix)
+    if (args.chunksize or args.incremental) and (formato(args.csv) != "csv" or
+                                                 formato(file_path) != "csv"):
+        parser.error("--chunksize e --incremental exigem entrada e saída em CSV")
+    if args.incremental and args.min_overlap != 2:
+        parser.error("--min-overlap não é suportado com --incremental")
+    if args.float32 and (args.chunksize or args.incremental):
+        parser.error("--float32 não é suportado com --chunksize ou --incremental")
+    # Em blocos e no modo incremental o log é só o .log em texto, gravado por posto e
+    # acrescentado a cada execução, sem o .log.npz nem os pesos dos doadores
+    if (args.weights or args.text_log) and (args.chunksize or args.incremental):
+        parser.error("--weights e --text-log não são suportados com --chunksize ou --incremental "
+                     "(o log desses modos é sempre o .log em texto)")
+    if args.incremental and args.workers != 1:
+        parser.error("--workers não é suportado com --incremental")
+    instrumentacao = None
+    if args.report or args.profile or args.trace_memory:
+        instrumentacao = ativar(Instrumentacao(memoria=args.trace_memory, perfil=args.profile))
+    try:
+        arquivo_log = _preencher(parser, args, file_path)
+    finally:
+        desativar()
+    print(f"Dados gravados com sucesso em {file_path} e {arquivo_log}.")
+    if instrumentacao is not None:
+        arquivos = instrumentacao.salvar(file_path)
+        print("Relatório de tempos em " + ", ".join(str(a) for a in arquivos) + ".")
+    return 0
+
+
+def _estacoesCSV(fileCSV, indexData=None):
+    """Postos (colunas) do CSV, lidos só do cabeçalho"""
+    colunas = list(pd.read_csv(fileCSV, nrows=0).columns)
+    colunas.remove(indexData or colunas[0])
+    return colunas
+
+
+def _preencher(parser, args, file_path):
+    """Executa o modo escolhido e retorna o arquivo de log gravado"""
+    if args.incremental and arquivoEstado(file_path).exists():
+        estado = EstadoIncremental.carregar(arquivoEstado(file_path))
+        if (estado.method, estado.distancia, estado.maxEst) != (args.method, args.distance,
+                                                                 args.max_gauges):
+            parser.error(f"parâmetros diferentes dos usados em {arquivoEstado(file_path)}; "
+                         "remova o estado para refazer o preenchimento completo")
+        reestimados = preencherIncremental(args.csv, file_path, estado, tol=args.tolerance)
+        arquivo_log = Path(file_path).with_suffix(".log")
+        print(f"{int(reestimados.sum())} postos com falhas antigas reestimadas.")
+    elif args.incremental:
+        coords = coordenadasPostos(lerPostos(args.shp, args.code), _estacoesCSV(args.csv, args.date))
+        arquivo_log, _ = preencherInicial(args.csv, file_path, coords,
+                                          args.method, args.distance, args.max_gauges,
+                                          indexData=args.date, chunksize=args.chunksize or 100000)
+    elif args.chunksize:
+        coords = coordenadasPostos(lerPostos(args.shp, args.code), _estacoesCSV(args.csv, args.date))
+        arquivo_log = preencherCSV(args.csv, file_path, coords, args.method,
+                                   args.distance, args.max_gauges, indexData=args.date,
+                                   chunksize=args.chunksize, workers=args.workers,
+                                   minSobreposicao=args.min_overlap)
+    else:
+        dtype = np.float32 if args.float32 else np.float64
+        dataPlu = lerDados(args.csv)
+        indexData = args.date or dataPlu.columns[0]
+        dataPlu.set_index(indexData, inplace=True)
+        if args.no_cache:
+            coords = coordenadasPostos(lerPostos(args.shp, args.code), dataPlu.columns)
+            engine = FillGapsEngine().fit(dataPlu, coords=coords,
+                                          minSobreposicao=args.min_overlap, dtype=dtype)
+        else:
+            engine = ajustarComCache(dataPlu, args.csv, args.shp, indexData, args.code,
+                                     minSobreposicao=args.min_overlap, dtype=dtype)
+        engine.fill(args.method, args.distance, args.max_gauges, workers=args.workers,
+                    pesos=args.weights)
+        arquivo_log = engine.salvar(file_path, logTexto=args.text_log)
+    return arquivo_log
+
+
+if __name__ == "__main__":
+    sys.exit(main())
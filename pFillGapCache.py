@@ -0,0 +1,144 @@
+# pFillGaps
+# Copyright (C) [2024] [Cláudio Bielenki Jr]
+#
+# Este programa é software livre; você pode redistribuí-lo e/ou
+# modificá-lo sob os termos da Licença Pública Geral GNU,
+# conforme publicada pela Free Software Foundation; tanto a versão 3
+# da Licença, ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM NENHUMA GARANTIA; nem mesmo a garantia implícita de
+# COMERCIABILIDADE OU ADEQUAÇÃO A UM PROPÓSITO ESPECÍFICO. Consulte a
+# Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU
+# junto com este programa; se não, veja <https://www.gnu.org/licenses/>.
+
+"""Cache em disco das estatísticas e coordenadas dos postos.
+
+A leitura e reprojeção do shapefile e o cálculo de médias, desvios e
+correlações dependem apenas do conteúdo do CSV, do shapefile e das colunas
+escolhidas. O resultado é guardado em um .npz na pasta `.pFillGapsCache` ao
+lado do CSV, identificado por um hash desses dados, e reaproveitado quando
+só o método, o raio ou o número de postos mudam. Os arquivos mais antigos
+são removidos quando o cache passa do limite de tamanho.
+"""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+import numpy as np
+from pFillGapCore import FillGapsEngine, coordenadasPostos, lerPostos
+from pFillGapIO import arquivosDados
+from pFillGapProfile import contar
+
+# Mudar quando o conteúdo do cache mudar, para invalidar os arquivos antigos
+CACHE_VERSAO = 3
+LIMITE_PADRAO = 1024 ** 3
+SUFIXOS_SHP = (".shp", ".shx", ".dbf", ".prj", ".cpg")
+
+
+def diretorioCache(fileCSV):
+    return Path(fileCSV).resolve().parent / ".pFillGapsCache"
+
+
+def _atualizarHash(hash, arquivo):
+    with open(arquivo, "rb") as file:
+        for bloco in iter(lambda: file.read(1 << 20), b""):
+            hash.update(bloco)
+
+
+class CacheEstatisticas:
+    """Arquivos .npz de estatísticas indexados pelo hash das entradas"""
+
+    def __init__(self, diretorio, limiteBytes=LIMITE_PADRAO):
+        self.diretorio = Path(diretorio)
+        self.limiteBytes = limiteBytes
+
+    def chave(self, fileCSV, shapefile, indexData, indexSHP, dtype=np.float64):
+        """Hash do conteúdo dos dados, dos arquivos do shapefile, das colunas escolhidas e da precisão"""
+        hash = hashlib.blake2b(digest_size=20)
+        hash.update(f"v{CACHE_VERSAO}|{indexData}|{indexSHP}|{np.dtype(dtype).name}|".encode("utf-8"))
+        for arquivo in arquivosDados(fileCSV):
+            _atualizarHash(hash, arquivo)
+        for sufixo in SUFIXOS_SHP:
+            arquivo = Path(shapefile).with_suffix(sufixo)
+            if arquivo.exists():
+                hash.update(sufixo.encode("utf-8"))
+                _atualizarHash(hash, arquivo)
+        return hash.hexdigest()
+
+    def _arquivo(self, chave):
+        return self.diretorio / f"{chave}.npz"
+
+    def carregar(self, chave):
+        """Conteúdo guardado para a chave, ou None se não houver"""
+        arquivo = self._arquivo(chave)
+        try:
+            with np.load(arquivo, allow_pickle=False) as npz:
+                dados = {nome: npz[nome] for nome in npz.files}
+        except (OSError, ValueError):
+            return None
+        # Marca como usado recentemente para a remoção por tamanho
+        os.utime(arquivo)
+        return dados
+
+    def salvar(self, chave, **arrays):
+        """Grava os arrays de forma atômica e remove os arquivos mais antigos se preciso"""
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        fd, temporario = tempfile.mkstemp(suffix=".npz", dir=self.diretorio)
+        try:
+            with os.fdopen(fd, "wb") as file:
+                np.savez(file, **arrays)
+            os.replace(temporario, self._arquivo(chave))
+        except BaseException:
+            os.remove(temporario)
+            raise
+        self.limitar()
+
+    def limitar(self):
+        """Remove os arquivos menos usados até o cache caber no limite"""
+        arquivos = sorted(self.diretorio.glob("*.npz"), key=lambda a: a.stat().st_mtime)
+        total = sum(a.stat().st_size for a in arquivos)
+        for arquivo in arquivos[:-1]:
+            if total <= self.limiteBytes:
+                break
+            total -= arquivo.stat().st_size
+            arquivo.unlink()
+
+
+def ajustarComCache(dataPlu, fileCSV, shapefile, indexData, indexSHP, cache=None,
+                    minSobreposicao=2, dtype=np.float64):
+    """FillGapsEngine ajustado, reaproveitando o cache quando as entradas não mudaram.
+
+    Sem cache válido, lê e reprojeta o shapefile, calcula as estatísticas e
+    grava o resultado para as próximas execuções. O cache guarda a
+    correlação completa e a sobreposição dos pares, e `minSobreposicao` é
+    aplicado depois da leitura. `dtype` segue FillGapsEngine.fit e faz parte
+    da chave do cache.
+    """
+    if cache is None:
+        cache = CacheEstatisticas(diretorioCache(fileCSV))
+    chave = cache.chave(fileCSV, shapefile, indexData, indexSHP, dtype)
+    dados = cache.carregar(chave)
+    estacoes = [str(c) for c in dataPlu.columns]
+    engine = FillGapsEngine()
+    if dados is not None and dados["estacoes"].tolist() == estacoes:
+        contar("cache_acertos")
+        engine.fit(dataPlu, coords=dados["coords"], estatisticas=dados,
+                   minSobreposicao=minSobreposicao, dtype=dtype)
+        engine.crs = str(dados["crs"])
+        return engine
+    contar("cache_falhas")
+    postos = lerPostos(shapefile, indexSHP)
+    engine.fit(dataPlu, coords=coordenadasPostos(postos, estacoes), minSobreposicao=minSobreposicao,
+               dtype=dtype)
+    engine.crs = postos.crs.to_wkt()
+    try:
+        cache.salvar(chave, estacoes=np.array(estacoes), coords=engine.vizinhanca.coords,
+                     crs=np.array(engine.crs), **engine.estatisticas())
+    except OSError as erro:
+        # Pasta sem permissão de escrita: segue sem cache
+        print(f"Cache não gravado em {cache.diretorio}: {erro}")
+    return engine
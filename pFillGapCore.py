@@ -0,0 +1,709 @@
+# pFillGaps
+# Copyright (C) [2024] [Cláudio Bielenki Jr]
+#
+# Este programa é software livre; você pode redistribuí-lo e/ou
+# modificá-lo sob os termos da Licença Pública Geral GNU,
+# conforme publicada pela Free Software Foundation; tanto a versão 3
+# da Licença, ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM NENHUMA GARANTIA; nem mesmo a garantia implícita de
+# COMERCIABILIDADE OU ADEQUAÇÃO A UM PROPÓSITO ESPECÍFICO. Consulte a
+# Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU
+# junto com este programa; se não, veja <https://www.gnu.org/licenses/>.
+
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from pFillGapIO import arquivoLog, formato, salvarDados, salvarTabelaLog
+from pFillGapLog import LogDoadores, arquivoLogBinario
+from pFillGapProfile import contar, etapa
+from pFillGapSpatial import VizinhancaPostos
+from pFillGapStats import ELEMENTOS_BLOCO, correlacaoPareada
+
+METODOS = ("Mean", "Correlation", "InvDist")
+# Fração máxima de padrões de disponibilidade distintos num bloco para que as
+# falhas sejam agrupadas; acima disso a seleção linha a linha é mais barata
+LIMIAR_GRUPOS = 0.5
+AMOSTRA_GRUPOS = 64
+# Diferença máxima das estimativas em float32 para as de float64, relativa a
+# max(|valor|, desvio padrão do posto) (ver FillGapsEngine.fit)
+TOLERANCIA_FLOAT32 = 1e-5
+
+
+class PreenchimentoCancelado(Exception):
+    """Levantada pela função de progresso para interromper o preenchimento"""
+
+
+def matrizIndices(arrayCorr, arrayDist):
+    """Índice de seleção dos postos doadores (correlação x inverso da distância)"""
+    return np.multiply(arrayCorr, arrayDist)
+
+
+def rankingDoadores(indicesCol):
+    """Posições dos doadores possíveis, do maior para o menor índice de seleção.
+
+    Índices nulos ou indefinidos (NaN) não identificam doador; empates ficam
+    na ordem das posições.
+    """
+    possiveis = np.flatnonzero(~np.isnan(indicesCol) & (indicesCol != 0))
+    return possiveis[np.argsort(-indicesCol[possiveis], kind="stable")]
+
+
+class RankingDoadores:
+    """Ranking dos doadores de todos os postos, calculado uma vez por raio.
+
+    Em formato CSR, como pFillGapSpatial.PesosVizinhos: o ranking do posto i
+    é posicoes[indptr[i]:indptr[i + 1]], com posições na lista de candidatos
+    do posto (_candidatos).
+    """
+
+    def __init__(self, indptr, posicoes):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.posicoes = np.asarray(posicoes, dtype=np.int64)
+
+    @classmethod
+    def calcular(cls, arrayCorr, arrayDist):
+        rankings = []
+        for col in range(np.shape(arrayCorr)[0]):
+            candidatos, distCol = _candidatos(arrayDist, col)
+            rankings.append(rankingDoadores(matrizIndices(arrayCorr[col, candidatos], distCol)))
+        indptr = np.zeros(len(rankings) + 1, dtype=np.int64)
+        np.cumsum([r.size for r in rankings], out=indptr[1:])
+        posicoes = np.concatenate(rankings) if rankings else np.empty(0, dtype=np.int64)
+        return cls(indptr, posicoes)
+
+    def doPosto(self, col):
+        return self.posicoes[self.indptr[col]:self.indptr[col + 1]]
+
+
+def _selecionarDoadores(dataBloco, ranking, maxEst):
+    """Seleciona os doadores de um bloco de falhas de um mesmo posto.
+
+    Percorre o `ranking` do posto (ver rankingDoadores) e toma, em cada
+    linha, os `maxEst` primeiros postos com dado. A varredura começa por um
+    trecho curto do ranking, alongado só para as linhas ainda incompletas.
+    Retorna as posições dos doadores em ordem crescente de índice (a ordem
+    da soma na estimativa), alinhadas à esquerda com -1 nas sobras, e a
+    contagem de doadores de cada linha.
+    """
+    nFalhas = dataBloco.shape[0]
+    K = max(1, min(maxEst, ranking.size))
+    doadores = np.full((nFalhas, K), -1, dtype=np.int64)
+    estValidas = np.zeros(nFalhas, dtype=np.int64)
+    pendentes = np.arange(nFalhas)
+    inicio, largura = 0, 2 * maxEst
+    while pendentes.size and inicio < ranking.size:
+        trecho = ranking[inicio:inicio + largura]
+        disponivel = ~np.isnan(dataBloco[np.ix_(pendentes, trecho)])
+        # Ordem de cada posto disponível entre os doadores da linha (1 = maior índice)
+        ordem = np.cumsum(disponivel, axis=1) + estValidas[pendentes, None]
+        linhas, colunas = np.nonzero(disponivel & (ordem <= maxEst))
+        doadores[pendentes[linhas], ordem[linhas, colunas] - 1] = trecho[colunas]
+        estValidas[pendentes] = np.minimum(ordem[:, -1], maxEst)
+        pendentes = pendentes[estValidas[pendentes] < maxEst]
+        inicio += largura
+        largura *= 2
+    # Do maior para o menor índice -> ordem crescente, alinhada à esquerda
+    inverso = estValidas[:, None] - 1 - np.arange(K)[None, :]
+    doadores = np.take_along_axis(doadores, np.maximum(inverso, 0), axis=1)
+    doadores[inverso < 0] = -1
+    return doadores, estValidas
+
+
+def _estimarBloco(dataBloco, doadores, estValidas, corrCol, distCol, means, stds, pMeans, pStds,
+                  method):
+    """Calcula a estimativa de um bloco de falhas de um posto.
+
+    dataBloco e os vetores corrCol, distCol, means e stds estão restritos aos
+    candidatos do posto; doadores são posições nessa lista.
+    """
+    nFalhas, K = doadores.shape
+    posicoes = np.maximum(doadores, 0)
+    usados = doadores >= 0
+    rowData = np.take_along_axis(dataBloco, posicoes, axis=1)
+    # Postos sem dado na linha entram com zero, como no cálculo original
+    validos = ~np.isnan(rowData) & usados
+    rowData = np.where(validos, rowData, 0)
+    arrayPMedia = np.where(validos, means[posicoes], 0)
+    arrayPStds = np.where(validos, stds[posicoes], 0)
+    arrayPCorr = np.where(validos, corrCol[posicoes], 0)
+    arrayPDist = np.where(validos, distCol[posicoes], 0)
+    precX = np.zeros(nFalhas)
+    # A soma segue a ordem crescente dos índices, termo a termo, para manter
+    # o mesmo arredondamento do laço original
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if method == "InvDist":
+            somaDist = np.zeros(nFalhas)
+            for j in range(K):
+                somaDist = np.where(usados[:, j], somaDist + arrayPDist[:, j], somaDist)
+        for j in range(K):
+            if method == "Mean":
+                termo = (1 / estValidas) * ((pMeans / arrayPMedia[:, j]) * rowData[:, j])
+            elif method == "Correlation":
+                termo = (pStds / estValidas) * (((rowData[:, j] - arrayPMedia[:, j]) / arrayPStds[:, j]) *
+                                                arrayPCorr[:, j])
+            else:
+                termo = (arrayPDist[:, j] / somaDist) * rowData[:, j]
+            precX = np.where(usados[:, j], precX + termo, precX)
+    if method == "Correlation":
+        precX = precX + pMeans
+    return precX
+
+
+def _pesosDoadores(doadores, estValidas, corrCol, distCol, means, stds, pMeans, pStds, method):
+    """Pesos e termo constante da estimativa de cada conjunto de doadores.
+
+    A estimativa é o produto dos dados dos doadores pelos pesos mais a
+    constante, com todos os doadores disponíveis (ver _estimarGrupos).
+    """
+    posicoes = np.maximum(doadores, 0)
+    usados = doadores >= 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if method == "Mean":
+            pesos = (pMeans / estValidas[:, None]) / means[posicoes]
+        elif method == "Correlation":
+            pesos = (pStds / estValidas[:, None]) * corrCol[posicoes] / stds[posicoes]
+        else:
+            arrayPDist = np.where(usados, distCol[posicoes], 0)
+            pesos = arrayPDist / arrayPDist.sum(axis=1, keepdims=True)
+        pesos = np.where(usados, pesos, 0)
+        constante = np.zeros(doadores.shape[0])
+        if method == "Correlation":
+            constante = pMeans - (pesos * np.where(usados, means[posicoes], 0)).sum(axis=1)
+    return pesos, constante
+
+
+def _estimarGrupos(dataBloco, ranking, corrCol, distCol, means, stds, pMeans, pStds, maxEst,
+                   method):
+    """Seleção e estimativa por padrão de disponibilidade dos doadores possíveis.
+
+    Linhas consecutivas com os mesmos postos disponíveis (entre os do
+    ranking) formam um grupo: têm os mesmos doadores e pesos, calculados uma
+    vez, e cada estimativa é um produto escalar. Falhas longas ficam num
+    único grupo sem o custo de ordenar os padrões. Difere da soma termo a termo de
+    _estimarBloco apenas no arredondamento (alguns ulp). Retorna doadores,
+    contagens, estimativas e pesos de cada linha, ou None quando há padrões
+    distintos demais para compensar o agrupamento.
+    """
+    nFalhas = dataBloco.shape[0]
+    possiveis = ranking
+    # Amostra inicial: falhas esparsas raramente repetem o padrão da linha anterior
+    amostra = ~np.isnan(dataBloco[:AMOSTRA_GRUPOS, possiveis])
+    if (amostra[1:] != amostra[:-1]).any(axis=1).mean() > LIMIAR_GRUPOS:
+        return None
+    padroes = np.packbits(~np.isnan(dataBloco[:, possiveis]), axis=1)
+    novo = np.ones(nFalhas, dtype=bool)
+    novo[1:] = (padroes[1:] != padroes[:-1]).any(axis=1)
+    representantes = np.flatnonzero(novo)
+    grupo = np.cumsum(novo) - 1
+    if representantes.size > LIMIAR_GRUPOS * nFalhas:
+        return None
+    doadoresG, validasG = _selecionarDoadores(dataBloco[representantes], ranking, maxEst)
+    pesos, constante = _pesosDoadores(doadoresG, validasG, corrCol, distCol, means, stds, pMeans,
+                                      pStds, method)
+    doadores = doadoresG[grupo]
+    rowData = np.take_along_axis(dataBloco, np.maximum(doadores, 0), axis=1)
+    rowData = np.where(doadores >= 0, rowData, 0)
+    pesos = pesos[grupo]
+    precX = np.einsum("ij,ij->i", rowData, pesos) + constante[grupo]
+    return doadores, validasG[grupo], precX, pesos
+
+
+def _candidatos(arrayDist, col):
+    """Postos candidatos a doador de `col` e seus pesos de distância"""
+    if isinstance(arrayDist, np.ndarray):
+        return np.arange(arrayDist.shape[1]), arrayDist[col]
+    # Vizinhança esparsa (pFillGapSpatial.PesosVizinhos)
+    return arrayDist.vizinhos(col)
+
+
+def _preencherPostos(arrayData, arrayCorr, arrayDist, means, stds, maxEst, method, colunas,
+                     blockSize, progresso=None, agrupar=True, pesos=False, ranking=None):
+    """Estima as falhas dos postos em `colunas`, na ordem posto/linha.
+
+    Retorna as linhas, colunas, valores estimados (NaN nas falhas não
+    preenchidas) e doadores (-1 nas sobras) de cada falha e, com `pesos`,
+    o peso de cada doador na estimativa (zero nas sobras). `progresso`, se
+    informado, é chamado com o número de falhas já estimadas após cada bloco.
+    Com `agrupar`, blocos com poucos padrões de falha usam _estimarGrupos.
+    `ranking` (RankingDoadores) evita recalcular o ranking de cada posto.
+    """
+    feitas = 0
+    gapRows, gapCols, gapValues, gapDonors, gapWeights = [], [], [], [], []
+    for col in colunas:
+        # Falhas do posto, sem máscara da matriz inteira
+        linhasFalha = np.flatnonzero(np.isnan(arrayData[:, col]))
+        if not linhasFalha.size:
+            continue
+        candidatos, distCol = _candidatos(arrayDist, col)
+        corrCol = arrayCorr[col, candidatos]
+        if ranking is not None:
+            rankingCol = ranking.doPosto(col)
+        else:
+            rankingCol = rankingDoadores(matrizIndices(corrCol, distCol))
+        meansCol = means[candidatos]
+        stdsCol = stds[candidatos]
+        for inicio in range(0, linhasFalha.size, blockSize):
+            linhas = linhasFalha[inicio:inicio + blockSize]
+            dataBloco = arrayData[np.ix_(linhas, candidatos)]
+            if candidatos.size:
+                agrupado = None
+                if agrupar and linhas.size > 1:
+                    agrupado = _estimarGrupos(dataBloco, rankingCol, corrCol, distCol, meansCol,
+                                              stdsCol, means[col], stds[col], maxEst, method)
+                if agrupado is not None:
+                    doadores, estValidas, precX, pesosBloco = agrupado
+                else:
+                    doadores, estValidas = _selecionarDoadores(dataBloco, rankingCol, maxEst)
+                    precX = _estimarBloco(dataBloco, doadores, estValidas, corrCol, distCol,
+                                          meansCol, stdsCol, means[col], stds[col], method)
+                    if pesos:
+                        pesosBloco = _pesosDoadores(doadores, estValidas, corrCol, distCol,
+                                                    meansCol, stdsCol, means[col], stds[col],
+                                                    method)[0]
+                doadores = np.where(doadores >= 0, candidatos[np.maximum(doadores, 0)], -1)
+            else:
+                doadores = np.full((linhas.size, 1), -1)
+                estValidas = np.zeros(linhas.size, dtype=int)
+                precX = np.full(linhas.size, np.nan)
+                pesosBloco = np.zeros((linhas.size, 1))
+            # Largura fixa para concatenar postos com poucos candidatos
+            if doadores.shape[1] < maxEst:
+                sobra = np.full((linhas.size, maxEst - doadores.shape[1]), -1)
+                doadores = np.concatenate([doadores, sobra], axis=1)
+                if pesos:
+                    pesosBloco = np.concatenate([pesosBloco, np.zeros(sobra.shape)], axis=1)
+            gapRows.append(linhas)
+            gapCols.append(np.full(linhas.size, col))
+            gapValues.append(np.where(estValidas > 0, precX, np.nan))
+            gapDonors.append(doadores)
+            if pesos:
+                gapWeights.append(pesosBloco)
+            feitas += linhas.size
+            if progresso is not None:
+                progresso(feitas)
+    if not gapRows:
+        resultado = (np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0),
+                     np.empty((0, maxEst), dtype=int))
+        return resultado + (np.empty((0, maxEst)),) if pesos else resultado
+    resultado = (np.concatenate(gapRows), np.concatenate(gapCols), np.concatenate(gapValues),
+                 np.concatenate(gapDonors))
+    return resultado + (np.concatenate(gapWeights),) if pesos else resultado
+
+
+def preencherFalhas(arrayData, arrayCorr, arrayDist, means, stds, maxEst, method, blockSize=4096,
+                    workers=1, progresso=None, agrupar=True, pesos=False, dtype=np.float64,
+                    inplace=False, ranking=None):
+    """Preenche as falhas (NaN) da matriz de dados de forma vetorizada.
+
+    arrayDist é a matriz densa de pesos (inverso da distância, zero fora do
+    raio) ou uma vizinhança esparsa de pFillGapSpatial. Para cada posto, as
+    falhas são processadas em blocos de até `blockSize` linhas. Com `workers`
+    > 1 os postos são divididos entre processos (ver pFillGapParallel), com o
+    mesmo resultado. Retorna a matriz preenchida e, na ordem posto/linha do
+    log original, as linhas, colunas e doadores (-1 nas sobras) de cada falha.
+
+    Os doadores de cada falha são os `maxEst` primeiros postos com dado no
+    ranking do posto (maior correlação x inverso da distância primeiro;
+    índices nulos ou indefinidos fora), somados em ordem crescente de índice.
+    `ranking` (RankingDoadores.calcular com as mesmas correlações e pesos)
+    pode ser reaproveitado entre métodos e execuções; sem ele, é calculado
+    uma vez aqui.
+
+    `progresso(feitas, total)` é chamado ao longo do cálculo com o número de
+    falhas estimadas; pode levantar PreenchimentoCancelado para interrompê-lo.
+
+    Com `agrupar`, falhas de um posto com o mesmo padrão de postos
+    disponíveis compartilham a seleção de doadores e os pesos (falhas longas,
+    como um posto parado por meses). Os doadores são os mesmos; os valores
+    podem diferir em alguns ulp da soma termo a termo, que `agrupar=False`
+    reproduz exatamente.
+
+    Com `pesos`, retorna também o peso de cada doador na estimativa.
+
+    `dtype` é o tipo da matriz de dados, das correlações e da matriz densa de
+    pesos (float32 reduz a memória à metade; ver FillGapsEngine.fit); médias,
+    desvios e as estimativas de cada bloco continuam em float64. Com
+    `inplace`, as falhas são preenchidas na própria `arrayData` (quando já é
+    do tipo `dtype`), sem a cópia da matriz inteira.
+    """
+    if method not in METODOS:
+        raise ValueError(f"Método desconhecido: {method}")
+    arrayData = np.asarray(arrayData, dtype=dtype)
+    arrayCorr = np.asarray(arrayCorr, dtype=dtype)
+    if not hasattr(arrayDist, "vizinhos"):
+        arrayDist = np.asarray(arrayDist, dtype=dtype)
+    means = np.asarray(means, dtype=float)
+    stds = np.asarray(stds, dtype=float)
+    nEst = arrayData.shape[1]
+    maxEst = max(1, min(int(maxEst), nEst))
+    avisar = None
+    if progresso is not None:
+        total = int(np.count_nonzero(np.isnan(arrayData)))
+
+        def avisar(feitas):
+            progresso(feitas, total)
+    if ranking is None:
+        with etapa("ranking"):
+            ranking = RankingDoadores.calcular(arrayCorr, arrayDist)
+    with etapa("preenchimento"):
+        if workers > 1:
+            from pFillGapParallel import preencherPostosParalelo
+            resultado = preencherPostosParalelo(
+                arrayData, arrayCorr, arrayDist, means, stds, maxEst, method, blockSize, workers,
+                progresso=avisar, agrupar=agrupar, pesos=pesos, ranking=ranking)
+        else:
+            resultado = _preencherPostos(
+                arrayData, arrayCorr, arrayDist, means, stds, maxEst, method, range(nEst),
+                blockSize, progresso=avisar, agrupar=agrupar, pesos=pesos, ranking=ranking)
+    gapRows, gapCols, gapValues, gapDonors = resultado[:4]
+    arrayDataP = arrayData if inplace else np.copy(arrayData)
+    arrayDataP[gapRows, gapCols] = gapValues
+    naoPreenchidas = int(np.count_nonzero(np.isnan(gapValues)))
+    contar("falhas", gapRows.size)
+    contar("falhas_preenchidas", gapRows.size - naoPreenchidas)
+    contar("falhas_nao_preenchidas", naoPreenchidas)
+    contar("doadores_usados", np.count_nonzero(gapDonors >= 0))
+    if pesos:
+        return arrayDataP, gapRows, gapCols, gapDonors, resultado[4]
+    return arrayDataP, gapRows, gapCols, gapDonors
+
+
+@lru_cache(maxsize=1)
+def _zonasUTM():
+    """Código EPSG e área de uso das zonas UTM (WGS 84), consultados uma vez por processo"""
+    from pyproj.database import query_utm_crs_info
+    return tuple((info.code, info.area_of_use) for info in query_utm_crs_info(datum_name="WGS 84")
+                 if info.area_of_use is not None)
+
+
+@lru_cache(maxsize=None)
+def _crsEPSG(code):
+    from pyproj import CRS
+    return CRS.from_epsg(code)
+
+
+def zonaUTM(west, south, east, north):
+    """CRS UTM (WGS 84) para a extensão em graus.
+
+    Mesma escolha da consulta ao PROJ com área de interesse (a primeira zona
+    cuja área de uso intersecta a extensão), mas feita sobre a lista de
+    zonas lida uma vez, de modo que bacias diferentes na mesma zona
+    reaproveitam a consulta e o CRS.
+    """
+    for code, area in _zonasUTM():
+        if area.west <= east and area.east >= west and area.south <= north and area.north >= south:
+            return _crsEPSG(code)
+    raise ValueError(f"Nenhuma zona UTM para a extensão {(west, south, east, north)}")
+
+
+def _codigoPosto(valor):
+    """Código do posto como texto, comparável aos nomes das colunas dos dados"""
+    if isinstance(valor, float) and valor.is_integer():
+        # Campos numéricos do DBF: 123456.0 -> "123456"
+        return str(int(valor))
+    return str(valor).strip()
+
+
+class PostosShapefile:
+    """Pontos dos postos lidos do shapefile: códigos, coordenadas (x, y) e CRS"""
+
+    def __init__(self, codigos, coords, crs):
+        self.codigos = codigos
+        self.coords = np.asarray(coords, dtype=float)
+        self.crs = crs
+
+    def __len__(self):
+        return self.coords.shape[0]
+
+    def alinhar(self, estacoes):
+        """Coordenadas na ordem de `estacoes` (colunas dos dados), pelo código do posto"""
+        if self.codigos is None:
+            raise ValueError("Shapefile lido sem o campo de código dos postos")
+        posicao = {}
+        for i, codigo in enumerate(self.codigos):
+            if codigo in posicao:
+                raise ValueError(f"Código de posto repetido no shapefile: {codigo}")
+            posicao[codigo] = i
+        linhas = [posicao.get(str(e).strip(), -1) for e in estacoes]
+        ausentes = [str(e) for e, linha in zip(estacoes, linhas) if linha < 0]
+        if ausentes:
+            raise ValueError(f"{len(ausentes)} postos dos dados sem ponto no shapefile: "
+                             + ", ".join(ausentes[:10]) + (", ..." if len(ausentes) > 10 else ""))
+        return self.coords[linhas]
+
+
+def lerPostos(shapefile, indexSHP=None):
+    """Lê os pontos dos postos com o OGR e reprojeta para UTM se estiverem em graus.
+
+    Uma única leitura traz só as coordenadas e o campo `indexSHP` (os demais
+    campos são ignorados pelo OGR); a reprojeção é feita sobre os arrays com
+    um pyproj.Transformer.
+    """
+    # Importações pesadas só quando o shapefile é realmente lido
+    from osgeo import ogr
+    from pyproj import CRS, Transformer
+    with etapa("leitura_shapefile"):
+        datasource = ogr.Open(str(shapefile), 0)
+        if datasource is None:
+            raise OSError(f"Não foi possível abrir o shapefile {shapefile}")
+        layer = datasource.GetLayer()
+        layer_def = layer.GetLayerDefn()
+        campos = [layer_def.GetFieldDefn(i).GetName() for i in range(layer_def.GetFieldCount())]
+        if indexSHP is not None and indexSHP not in campos:
+            raise ValueError(f"Campo {indexSHP} não encontrado em {shapefile}")
+        layer.SetIgnoredFields([c for c in campos if c != indexSHP] + ["OGR_STYLE"])
+        srs = layer.GetSpatialRef()
+        if srs is None:
+            raise ValueError(f"Shapefile sem sistema de coordenadas (.prj): {shapefile}")
+        coords = np.empty((max(layer.GetFeatureCount(), 0), 2))
+        codigos = [] if indexSHP is not None else None
+        n = 0
+        for feature in layer:
+            geometria = feature.GetGeometryRef()
+            if geometria is None:
+                raise ValueError(f"Feição {feature.GetFID()} sem geometria em {shapefile}")
+            if n == coords.shape[0]:
+                coords = np.resize(coords, (2 * n + 1, 2))
+            coords[n] = geometria.GetX(), geometria.GetY()
+            if codigos is not None:
+                codigos.append(_codigoPosto(feature.GetField(indexSHP)))
+            n += 1
+        coords = coords[:n]
+        srid = CRS.from_wkt(srs.ExportToWkt())
+        datasource = None
+    if srid.coordinate_system.name == 'ellipsoidal':
+        extent = (coords[:, 0].min(), coords[:, 1].min(), coords[:, 0].max(), coords[:, 1].max())
+        utm_crs = zonaUTM(*(float(v) for v in extent))
+        with etapa("reprojecao"):
+            transformer = Transformer.from_crs(srid, utm_crs, always_xy=True)
+            x, y = transformer.transform(coords[:, 0], coords[:, 1])
+            coords = np.column_stack([x, y])
+        srid = utm_crs
+    return PostosShapefile(codigos, coords, srid)
+
+
+def coordenadasPostos(postos, estacoes=None):
+    """Coordenadas (x, y) dos postos, na ordem de `estacoes` quando lidos com o campo de código.
+
+    Sem campo de código (ou sem `estacoes`) as coordenadas seguem a ordem das
+    feições, que deve então ser a das colunas dos dados.
+    """
+    if estacoes is None or postos.codigos is None:
+        return postos.coords
+    return postos.alinhar(estacoes)
+
+
+def mediasDesvios(dataPlu):
+    """DataFrame.mean() e DataFrame.std() calculados por blocos de colunas.
+
+    Mesmos valores das chamadas sobre a tabela inteira (cada coluna é
+    reduzida à parte), com temporários do tamanho de um bloco. Os blocos são
+    menores que os da correlação: std cria três cópias float64 do bloco e o
+    custo não depende do tamanho dele.
+    """
+    passo = max(1, ELEMENTOS_BLOCO // 8 // max(len(dataPlu), 1))
+    blocos = [dataPlu.iloc[:, i:i + passo] for i in range(0, max(dataPlu.shape[1], 1), passo)]
+    return pd.concat([bloco.mean() for bloco in blocos]), pd.concat([bloco.std() for bloco in blocos])
+
+
+def pesosDistancia(matrixDist, distancia):
+    """Inverso da distância, zerado fora do raio de busca, no tipo de `matrixDist`"""
+    matrixDist = np.asarray(matrixDist)
+    if not np.issubdtype(matrixDist.dtype, np.floating):
+        matrixDist = matrixDist.astype(float)
+    # Sem a máscara inteira 0/1 do raio: fora dele o peso é zero diretamente
+    with np.errstate(divide="ignore"):
+        return np.where(matrixDist > distancia, matrixDist.dtype.type(0), 1 / matrixDist)
+
+
+class FillGapsEngine:
+    """Preenchimento de falhas sem interface gráfica.
+
+    `fit` calcula as estatísticas dos postos e guarda as coordenadas (índice
+    espacial) ou a matriz densa de distâncias;
+    `fill` preenche as falhas com um método, raio e número máximo de postos,
+    podendo ser chamado várias vezes sobre o mesmo ajuste.
+    """
+
+    def __init__(self):
+        self.dataPlu = None
+        self.indexLista = None
+        self.estacoes = None
+        self.means = None
+        self.stds = None
+        self.matrixCorr = None
+        self.arrayCorr = None
+        self.sobreposicao = None
+        self.matrixDist = None
+        self.vizinhanca = None
+        self.crs = None
+        self.dtype = np.dtype(np.float64)
+        # rankings[distancia] = RankingDoadores do último ajuste
+        self.rankings = {}
+        self.log = None
+        self.df = None
+
+    # Arrays do log compacto (pFillGapLog.LogDoadores) do último `fill`
+    @property
+    def gapRows(self):
+        return None if self.log is None else self.log.linhas
+
+    @property
+    def gapCols(self):
+        return None if self.log is None else self.log.postos
+
+    @property
+    def gapDonors(self):
+        return None if self.log is None else self.log.doadores
+
+    @property
+    def preenchimento(self):
+        """Dicionário (data, posto) -> doadores, montado a partir do log compacto"""
+        return None if self.log is None else self.log.registro()
+
+    def fit(self, dataPlu, matrixDist=None, coords=None, estatisticas=None, minSobreposicao=2,
+            dtype=np.float64, blocoColunas=None):
+        """dataPlu: postos nas colunas e datas no índice.
+
+        Informe `coords` (x, y projetados, em metros, na ordem das colunas)
+        para a busca de vizinhos por índice espacial, ou `matrixDist` com as
+        distâncias entre todos os postos. `estatisticas` (ver
+        `estatisticas()`) evita recalcular médias, desvios e correlações.
+
+        A correlação usa pFillGapStats.correlacaoPareada (`dtype` e
+        `blocoColunas` seguem MomentosPareados). `matrixCorr` guarda a
+        correlação completa; em `arrayCorr`, usada na seleção dos doadores,
+        pares com menos de `minSobreposicao` linhas comuns ficam sem
+        correlação e não são usados.
+
+        Com `dtype=np.float32` (modo de baixa memória) as correlações, a
+        matriz de distâncias e a matriz de dados de `fill` ficam em float32,
+        ocupando metade da memória. A diferença para float64 é de até
+        TOLERANCIA_FLOAT32 (1e-5) vezes max(|valor|, desvio padrão do posto):
+        perto de zero o método Correlation soma desvios à média que se
+        cancelam, e o erro relativo ao valor pode passar de 1e-3, mas o erro
+        absoluto fica na ordem de 1e-5 mm. Nas redes sintéticas de
+        benchmarks/verificarLegado.py (raio de 150 km, 5 postos) a maior
+        diferença nessa escala foi 3e-7, com os mesmos doadores. Doadores com
+        índices iguais até a sétima casa significativa podem ser escolhidos
+        em outra ordem.
+        """
+        with etapa("fit"):
+            nEst = dataPlu.shape[1]
+            if (matrixDist is None) == (coords is None):
+                raise ValueError("Informe matrixDist ou coords")
+            if coords is not None:
+                with etapa("indice_espacial"):
+                    self.vizinhanca = VizinhancaPostos(coords)
+                if self.vizinhanca.nEst != nEst:
+                    raise ValueError(f"{self.vizinhanca.nEst} coordenadas para {nEst} postos")
+            else:
+                matrixDist = np.asarray(matrixDist, dtype=dtype)
+                if matrixDist.shape != (nEst, nEst):
+                    raise ValueError(f"Matriz de distâncias {matrixDist.shape} incompatível com "
+                                     f"{nEst} postos")
+            self.dataPlu = dataPlu
+            self.indexLista = dataPlu.index.values.tolist()
+            self.estacoes = [str(c) for c in dataPlu.columns]
+            if estatisticas is not None:
+                self.means = pd.Series(estatisticas["means"], index=dataPlu.columns)
+                self.stds = pd.Series(estatisticas["stds"], index=dataPlu.columns)
+                arrayCorr = np.asarray(estatisticas["arrayCorr"], dtype=float)
+                self.sobreposicao = estatisticas.get("sobreposicao")
+            else:
+                # Por blocos, sem cópias da tabela inteira (ver mediasDesvios e correlacaoPareada)
+                with etapa("estatisticas"):
+                    self.means, self.stds = mediasDesvios(dataPlu)
+                    arrayCorr, self.sobreposicao = correlacaoPareada(dataPlu, dtype, blocoColunas)
+            self.dtype = np.dtype(dtype)
+            arrayCorr = np.asarray(arrayCorr, dtype=self.dtype)
+            self.matrixCorr = pd.DataFrame(arrayCorr, index=dataPlu.columns,
+                                           columns=dataPlu.columns, copy=False)
+            if self.sobreposicao is not None and minSobreposicao > 2:
+                arrayCorr = np.where(self.sobreposicao >= minSobreposicao, arrayCorr, np.nan)
+            self.arrayCorr = arrayCorr
+            self.matrixDist = matrixDist
+            self.rankings = {}
+        return self
+
+    def estatisticas(self):
+        """Médias, desvios, correlações e sobreposição dos pares calculados em `fit`"""
+        estatisticas = {"means": self.means.to_numpy(dtype=float),
+                        "stds": self.stds.to_numpy(dtype=float),
+                        "arrayCorr": self.matrixCorr.to_numpy()}
+        if self.sobreposicao is not None:
+            estatisticas["sobreposicao"] = self.sobreposicao
+        return estatisticas
+
+    @property
+    def maxDist(self):
+        """Maior distância entre postos, arredondada para cima ao quilômetro"""
+        if self.vizinhanca is not None:
+            return int(np.ceil(self.vizinhanca.maxDist / 1000) * 1000)
+        return int(np.ceil((np.max(self.matrixDist)) / 1000) * 1000)
+
+    def pesosDistancia(self, distancia):
+        with etapa("vizinhos"):
+            if self.vizinhanca is not None:
+                return self.vizinhanca.raio(distancia)
+            return pesosDistancia(self.matrixDist, distancia)
+
+    def rankingDoadores(self, distancia, arrayDist=None):
+        """Ranking dos doadores de cada posto no raio, guardado para os próximos `fill`"""
+        if distancia not in self.rankings:
+            if arrayDist is None:
+                arrayDist = self.pesosDistancia(distancia)
+            with etapa("ranking"):
+                self.rankings[distancia] = RankingDoadores.calcular(self.arrayCorr, arrayDist)
+        return self.rankings[distancia]
+
+    def fill(self, method, distancia, maxEst, workers=1, progresso=None, agrupar=True,
+             pesos=False):
+        """Preenche as falhas e retorna o DataFrame com a coluna de datas.
+
+        `workers` > 1 distribui os postos entre processos; `progresso`,
+        `agrupar` e `pesos` seguem a convenção de preencherFalhas. Os doadores
+        ficam em `log` (e os pesos, se pedidos). A matriz de dados é copiada
+        uma vez, no tipo escolhido em `fit`, e preenchida no lugar.
+        """
+        if self.dataPlu is None:
+            raise RuntimeError("fit deve ser chamado antes de fill")
+        with etapa(f"fill_{method}"):
+            arrayData = self.dataPlu.to_numpy(dtype=self.dtype, copy=True)
+            arrayDist = self.pesosDistancia(distancia)
+            resultado = preencherFalhas(
+                arrayData, self.arrayCorr, arrayDist,
+                self.means.to_numpy(dtype=float), self.stds.to_numpy(dtype=float), maxEst, method,
+                workers=workers, progresso=progresso, agrupar=agrupar, pesos=pesos,
+                dtype=self.dtype, inplace=True,
+                ranking=self.rankingDoadores(distancia, arrayDist))
+            arrayDataP = resultado[0]
+            self.log = LogDoadores(*resultado[1:4], self.indexLista, self.estacoes,
+                                   pesos=resultado[4] if pesos else None)
+        index_df = pd.DataFrame(self.indexLista, columns=[self.dataPlu.index.name])
+        data_df = pd.DataFrame(arrayDataP, columns=self.estacoes, copy=False)
+        self.df = pd.concat([index_df, data_df], axis=1)
+        return self.df
+
+    def salvar(self, file_path, logTexto=False):
+        """Grava os dados preenchidos e o log de preenchimento ao lado.
+
+        O formato segue a extensão (ver pFillGapIO): em CSV o log é o binário
+        <nome>.log.npz (pFillGapLog) e, com `logTexto`, também o .log em
+        texto; nos formatos colunares é uma tabela tipada. Retorna o log
+        gravado (o .log em texto, se pedido).
+        """
+        with etapa("gravacao_dados"):
+            salvarDados(self.df, file_path)
+        with etapa("gravacao_log"):
+            if formato(file_path) == "csv":
+                arquivo_log = self.log.salvar(arquivoLogBinario(file_path))
+                if logTexto:
+                    arquivo_log = self.log.salvarTexto(arquivoLog(file_path))
+                return arquivo_log
+            return salvarTabelaLog(file_path, self.gapRows, self.gapCols, self.gapDonors,
+                                   self.indexLista, self.estacoes, pesos=self.log.pesos)
@@ -0,0 +1,154 @@
+# pFillGaps
+# Copyright (C) [2024] [Cláudio Bielenki Jr]
+#
+# Este programa é software livre; você pode redistribuí-lo e/ou
+# modificá-lo sob os termos da Licença Pública Geral GNU,
+# conforme publicada pela Free Software Foundation; tanto a versão 3
+# da Licença, ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM NENHUMA GARANTIA; nem mesmo a garantia implícita de
+# COMERCIABILIDADE OU ADEQUAÇÃO A UM PROPÓSITO ESPECÍFICO. Consulte a
+# Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU
+# junto com este programa; se não, veja <https://www.gnu.org/licenses/>.
+
+"""Leitura e gravação das séries em CSV, Parquet, Feather ou NumPy (.npy).
+
+O formato é escolhido pela extensão do arquivo. Parquet e Feather usam o
+pyarrow, importado pelo pandas apenas quando necessário. No formato .npy a
+matriz de dados (linhas x postos, float64) é aberta com memory-map e as datas
+e nomes dos postos ficam num .json de mesmo nome.
+
+Fora do CSV, o log de preenchimento é gravado como tabela tipada ao lado dos
+dados (<nome>.log.parquet, .log.feather ou .log.npy).
+"""
+
+import json
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from pFillGapProfile import etapa
+
+FORMATOS = {".csv": "csv", ".parquet": "parquet", ".pq": "parquet", ".feather": "feather",
+            ".arrow": "feather", ".npy": "npy"}
+FILTRO_DADOS = "Dados (*.csv *.parquet *.pq *.feather *.arrow *.npy)"
+
+
+def formato(arquivo):
+    sufixo = Path(arquivo).suffix.lower()
+    if sufixo not in FORMATOS:
+        raise ValueError(f"Formato não suportado: {arquivo}")
+    return FORMATOS[sufixo]
+
+
+def comExtensao(arquivo, sufixo=".csv"):
+    """`arquivo` com `sufixo` acrescentado se não tiver extensão de um formato suportado"""
+    if Path(arquivo).suffix.lower() in FORMATOS:
+        return str(arquivo)
+    return str(arquivo) + sufixo
+
+
+def arquivoMeta(arquivo):
+    """Arquivo .json com datas e postos de uma matriz .npy"""
+    return Path(arquivo).with_suffix(".json")
+
+
+def arquivosDados(arquivo):
+    """Arquivos que compõem o conjunto de dados (para o hash do cache)"""
+    if formato(arquivo) == "npy":
+        return [Path(arquivo), arquivoMeta(arquivo)]
+    return [Path(arquivo)]
+
+
+def lerDados(arquivo):
+    """Tabela de dados com a coluna de datas e uma coluna por posto, como o pd.read_csv"""
+    with etapa("leitura_dados"):
+        return _lerDados(arquivo)
+
+
+def _lerDados(arquivo):
+    tipo = formato(arquivo)
+    if tipo == "csv":
+        return pd.read_csv(arquivo)
+    if tipo == "parquet":
+        return pd.read_parquet(arquivo)
+    if tipo == "feather":
+        return pd.read_feather(arquivo)
+    with open(arquivoMeta(arquivo), encoding="utf-8") as file:
+        meta = json.load(file)
+    # Memory-map: os valores só são lidos do disco quando usados
+    arrayData = np.load(arquivo, mmap_mode="r")
+    dataPlu = pd.DataFrame(arrayData, columns=meta["columns"], copy=False)
+    dataPlu.insert(0, meta["index_name"], meta["index"])
+    return dataPlu
+
+
+def salvarDados(df, arquivo):
+    """Grava a tabela de dados (datas na primeira coluna) no formato da extensão"""
+    tipo = formato(arquivo)
+    if tipo == "csv":
+        df.to_csv(arquivo)
+    elif tipo == "parquet":
+        df.to_parquet(arquivo, index=False)
+    elif tipo == "feather":
+        df.reset_index(drop=True).to_feather(arquivo)
+    else:
+        np.save(arquivo, df.iloc[:, 1:].to_numpy(dtype=float))
+        meta = {"index_name": str(df.columns[0]), "index": df.iloc[:, 0].tolist(),
+                "columns": [str(c) for c in df.columns[1:]]}
+        with open(arquivoMeta(arquivo), "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+
+
+def arquivoLog(arquivo):
+    """Log de preenchimento correspondente ao arquivo de saída"""
+    arquivo = Path(arquivo)
+    if formato(arquivo) == "csv":
+        return arquivo.with_suffix(".log")
+    return arquivo.with_suffix(".log" + arquivo.suffix)
+
+
+def tabelaLog(gapRows, gapCols, gapDonors, indexLista, estacoes, pesos=None):
+    """Log de preenchimento como tabela: data, posto, número de doadores e doadores.
+
+    Os postos são colunas categóricas; doadores não usados ficam nulos. Com
+    `pesos`, cada doador tem também a coluna peso_<n>.
+    """
+    nDoadores = np.count_nonzero(gapDonors >= 0, axis=1)
+    tabela = {"data": np.asarray(indexLista, dtype=object)[gapRows] if len(gapRows) else [],
+              "posto": pd.Categorical.from_codes(gapCols, categories=estacoes),
+              "n_doadores": nDoadores.astype(np.int16)}
+    for j in range(gapDonors.shape[1]):
+        tabela[f"doador_{j + 1}"] = pd.Categorical.from_codes(gapDonors[:, j], categories=estacoes)
+    if pesos is not None:
+        for j in range(pesos.shape[1]):
+            tabela[f"peso_{j + 1}"] = pesos[:, j]
+    return pd.DataFrame(tabela)
+
+
+def salvarTabelaLog(arquivo, gapRows, gapCols, gapDonors, indexLista, estacoes, pesos=None):
+    """Grava o log de preenchimento tipado no formato da extensão de `arquivo`"""
+    tipo = formato(arquivo)
+    if tipo == "npy":
+        # Linhas e postos como índices da matriz e dos nomes no .json dos dados
+        campos = [("linha", "i8"), ("posto", "i4"), ("n_doadores", "i2"),
+                  ("doadores", "i4", (gapDonors.shape[1],))]
+        if pesos is not None:
+            campos.append(("pesos", "f8", (gapDonors.shape[1],)))
+        registro = np.empty(len(gapRows), dtype=campos)
+        registro["linha"] = gapRows
+        registro["posto"] = gapCols
+        registro["n_doadores"] = np.count_nonzero(gapDonors >= 0, axis=1)
+        registro["doadores"] = gapDonors
+        if pesos is not None:
+            registro["pesos"] = pesos
+        np.save(arquivoLog(arquivo), registro)
+        return arquivoLog(arquivo)
+    tabela = tabelaLog(gapRows, gapCols, gapDonors, indexLista, estacoes, pesos)
+    if tipo == "parquet":
+        tabela.to_parquet(arquivoLog(arquivo), index=False)
+    else:
+        tabela.to_feather(arquivoLog(arquivo))
+    return arquivoLog(arquivo)
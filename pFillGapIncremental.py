@@ -0,0 +1,248 @@
+# pFillGaps
+# Copyright (C) [2024] [Cláudio Bielenki Jr]
+#
+# Este programa é software livre; você pode redistribuí-lo e/ou
+# modificá-lo sob os termos da Licença Pública Geral GNU,
+# conforme publicada pela Free Software Foundation; tanto a versão 3
+# da Licença, ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM NENHUMA GARANTIA; nem mesmo a garantia implícita de
+# COMERCIABILIDADE OU ADEQUAÇÃO A UM PROPÓSITO ESPECÍFICO. Consulte a
+# Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU
+# junto com este programa; se não, veja <https://www.gnu.org/licenses/>.
+
+"""Preenchimento incremental quando novas linhas são acrescentadas ao CSV.
+
+Uma execução completa (em blocos, ver pFillGapStream) grava também um
+estado: as somas de pFillGapStats, a posição em bytes do fim dos dados já
+processados e as estatísticas usadas nas estimativas de cada posto. Nas
+execuções seguintes só as linhas novas são lidas: as somas são atualizadas,
+as falhas novas são preenchidas e acrescentadas à saída e ao log.
+
+As falhas antigas de um posto só são reestimadas quando a média, o desvio
+ou a correlação do posto ou de seus vizinhos no raio mudaram mais que a
+tolerância em relação às usadas nas estimativas gravadas. Nesse caso a
+série completa e a saída anterior são lidas e reescritas.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from pFillGapCore import _preencherPostos, preencherFalhas
+from pFillGapLog import linhasLog
+from pFillGapSpatial import VizinhancaPostos
+from pFillGapStats import MomentosPareados
+from pFillGapStream import estatisticasCSV, preencherCSV
+
+# Bytes antes da posição gravada usados para verificar se o início do CSV mudou
+_ASSINATURA = 65536
+
+
+def arquivoEstado(file_path):
+    return Path(file_path).with_suffix(".estado.npz")
+
+
+def _assinatura(fileCSV, offset):
+    with open(fileCSV, "rb") as file:
+        file.seek(max(0, offset - _ASSINATURA))
+        return hashlib.blake2b(file.read(offset - max(0, offset - _ASSINATURA)),
+                               digest_size=20).hexdigest()
+
+
+def _referencia(momentos, pesos):
+    """Estatísticas de que dependem as estimativas de cada posto (alinhadas ao CSR)"""
+    means, stds, corr = momentos.medias(), momentos.desvios(), momentos.correlacao()
+    linhasCSR = np.repeat(np.arange(pesos.nEst), pesos.contagens())
+    return {"refMeanCol": means, "refStdCol": stds, "refMeanCand": means[pesos.indices],
+            "refStdCand": stds[pesos.indices], "refCorr": corr[linhasCSR, pesos.indices]}
+
+
+def _mudou(novo, antigo, tol, relativo=True):
+    with np.errstate(invalid="ignore"):
+        escala = np.maximum(np.abs(antigo), 1e-12) if relativo else 1
+        diferente = np.abs(novo - antigo) > tol * escala
+    # NaN de um lado só também conta como mudança
+    return diferente | (np.isnan(novo) != np.isnan(antigo))
+
+
+class EstadoIncremental:
+    """Estado de uma execução, gravado ao lado da saída (<saída>.estado.npz)"""
+
+    def __init__(self, estacoes, indexData, coords, method, distancia, maxEst, momentos, offset,
+                 assinatura, referencia):
+        self.estacoes = estacoes
+        self.indexData = indexData
+        self.coords = coords
+        self.method = method
+        self.distancia = distancia
+        self.maxEst = maxEst
+        self.momentos = momentos
+        self.offset = offset
+        self.assinatura = assinatura
+        self.referencia = referencia
+
+    def salvar(self, arquivo):
+        np.savez(arquivo, estacoes=np.array(self.estacoes), indexData=np.array(self.indexData),
+                 coords=self.coords, method=np.array(self.method), distancia=self.distancia,
+                 maxEst=self.maxEst, offset=self.offset,
+                 assinatura=np.array(self.assinatura), **self.momentos.paraArrays(),
+                 **self.referencia)
+
+    @classmethod
+    def carregar(cls, arquivo):
+        with np.load(arquivo, allow_pickle=False) as npz:
+            dados = {nome: npz[nome] for nome in npz.files}
+        referencia = {nome: dados[nome] for nome in ("refMeanCol", "refStdCol", "refMeanCand",
+                                                     "refStdCand", "refCorr")}
+        return cls(dados["estacoes"].tolist(), str(dados["indexData"]), dados["coords"],
+                   str(dados["method"]), float(dados["distancia"]), int(dados["maxEst"]),
+                   MomentosPareados.deArrays(dados), int(dados["offset"]),
+                   str(dados["assinatura"]), referencia)
+
+    def postosDesatualizados(self, pesos, tol):
+        """Postos cujas estimativas antigas dependem de estatísticas que mudaram além de `tol`"""
+        novo = _referencia(self.momentos, pesos)
+        ref = self.referencia
+        linhasCSR = np.repeat(np.arange(pesos.nEst), pesos.contagens())
+        # A escolha dos doadores depende da correlação em todos os métodos
+        candidato = _mudou(novo["refCorr"], ref["refCorr"], tol, relativo=False)
+        posto = np.zeros(pesos.nEst, dtype=bool)
+        if self.method in ("Mean", "Correlation"):
+            candidato |= _mudou(novo["refMeanCand"], ref["refMeanCand"], tol)
+            posto |= _mudou(novo["refMeanCol"], ref["refMeanCol"], tol)
+        if self.method == "Correlation":
+            candidato |= _mudou(novo["refStdCand"], ref["refStdCand"], tol)
+            posto |= _mudou(novo["refStdCol"], ref["refStdCol"], tol)
+        posto |= np.bincount(linhasCSR[candidato], minlength=pesos.nEst) > 0
+        return posto
+
+    def atualizarReferencia(self, pesos, postos):
+        """Passa a usar as estatísticas atuais como referência dos `postos` reestimados"""
+        novo = _referencia(self.momentos, pesos)
+        linhasCSR = np.repeat(np.arange(pesos.nEst), pesos.contagens())
+        for nome in ("refMeanCol", "refStdCol"):
+            self.referencia[nome] = np.where(postos, novo[nome], self.referencia[nome])
+        for nome in ("refMeanCand", "refStdCand", "refCorr"):
+            self.referencia[nome] = np.where(postos[linhasCSR], novo[nome], self.referencia[nome])
+
+
+def preencherInicial(fileCSV, file_path, coords, method, distancia, maxEst, indexData=None,
+                     chunksize=100000):
+    """Execução completa em blocos que grava também o estado para as próximas"""
+    tamanho = os.path.getsize(fileCSV)
+    with open(fileCSV, "rb") as file:
+        file.seek(max(0, tamanho - 1))
+        if tamanho and file.read(1) != b"\n":
+            raise ValueError(f"{fileCSV} deve terminar com quebra de linha para receber novas linhas")
+    estacoes, momentos = estatisticasCSV(fileCSV, indexData, chunksize)
+    if indexData is None:
+        indexData = pd.read_csv(fileCSV, nrows=0).columns[0]
+    arquivo_log = preencherCSV(fileCSV, file_path, coords, method, distancia, maxEst, indexData,
+                               chunksize, momentos=momentos)
+    pesos = VizinhancaPostos(coords).raio(distancia)
+    estado = EstadoIncremental(estacoes, indexData, np.asarray(coords, dtype=float), method,
+                               distancia, maxEst, momentos, tamanho,
+                               _assinatura(fileCSV, tamanho), _referencia(momentos, pesos))
+    estado.salvar(arquivoEstado(file_path))
+    return arquivo_log, estado
+
+
+def _linhasNovas(fileCSV, estado):
+    """Linhas acrescentadas depois da última execução"""
+    if os.path.getsize(fileCSV) < estado.offset or \
+            _assinatura(fileCSV, estado.offset) != estado.assinatura:
+        raise ValueError(f"{fileCSV} foi alterado antes das linhas novas; "
+                         "rode o preenchimento completo novamente")
+    colunas = pd.read_csv(fileCSV, nrows=0).columns
+    with open(fileCSV, "rb") as file:
+        file.seek(estado.offset)
+        if not file.read(1):
+            return None, estado.offset
+        file.seek(estado.offset)
+        novas = pd.read_csv(file, header=None, names=colunas)
+        fim = file.seek(0, os.SEEK_END)
+    return novas.set_index(estado.indexData), fim
+
+
+def _acrescentarLog(arquivo_log, gapRows, gapCols, gapDonors, indexLista, estacoes):
+    """Acrescenta ao .log em texto as linhas das falhas (mesmo formato de pFillGapStream)"""
+    with open(arquivo_log, "a") as file:
+        file.writelines(linhasLog(gapRows, gapCols, gapDonors, indexLista, estacoes))
+
+
+def preencherIncremental(fileCSV, file_path, estado, tol=1e-3):
+    """Preenche só as linhas novas do CSV, acrescentando-as à saída e ao log.
+
+    Retorna os postos cujas falhas antigas foram reestimadas.
+    """
+    novas, fim = _linhasNovas(fileCSV, estado)
+    if novas is None:
+        return np.zeros(len(estado.estacoes), dtype=bool)
+    arrayNovas = novas.to_numpy(dtype=float)
+    # Linhas já gravadas na saída, que continua a numeração
+    nLinhas = estado.momentos.linhas
+    estado.momentos.atualizar(arrayNovas)
+    means = estado.momentos.medias()
+    stds = estado.momentos.desvios()
+    arrayCorr = estado.momentos.correlacao()
+    pesos = VizinhancaPostos(estado.coords).raio(estado.distancia)
+    desatualizados = estado.postosDesatualizados(pesos, tol)
+    arquivo_log = Path(file_path).with_suffix(".log")
+    arrayDataP, gapRows, gapCols, gapDonors = preencherFalhas(
+        arrayNovas, arrayCorr, pesos, means, stds, estado.maxEst, estado.method)
+    index_df = pd.DataFrame(novas.index.values, columns=[novas.index.name])
+    data_df = pd.DataFrame(arrayDataP, columns=estado.estacoes)
+    df = pd.concat([index_df, data_df], axis=1)
+    df.index = pd.RangeIndex(nLinhas, nLinhas + len(df))
+    falhasNovas = (gapRows, gapCols, gapDonors, novas.index.values.tolist())
+    if desatualizados.any():
+        _reestimar(fileCSV, file_path, estado, df, desatualizados, arrayCorr, pesos, means, stds,
+                   falhasNovas)
+        estado.atualizarReferencia(pesos, desatualizados)
+    else:
+        df.to_csv(file_path, mode="a", header=False)
+        _acrescentarLog(arquivo_log, *falhasNovas, estado.estacoes)
+    estado.offset = fim
+    estado.assinatura = _assinatura(fileCSV, fim)
+    estado.salvar(arquivoEstado(file_path))
+    return desatualizados
+
+
+def _reestimar(fileCSV, file_path, estado, dfNovas, desatualizados, arrayCorr, pesos, means, stds,
+               falhasNovas):
+    """Reestima todas as falhas dos postos desatualizados e reescreve a saída e o log.
+
+    `falhasNovas` são as linhas, postos e doadores das falhas das linhas novas
+    e as datas dessas linhas, como retornados por preencherFalhas.
+    """
+    colunas = np.flatnonzero(desatualizados)
+    dataPlu = pd.read_csv(fileCSV).set_index(estado.indexData)
+    arrayData = dataPlu.to_numpy(dtype=float)
+    gapRows, gapCols, gapValues, gapDonors = _preencherPostos(
+        arrayData, arrayCorr, pesos, means, stds, max(1, min(estado.maxEst, arrayData.shape[1])),
+        estado.method, colunas, 4096)
+    anterior = pd.read_csv(file_path, index_col=0)
+    saida = pd.concat([anterior, dfNovas])
+    valores = saida.iloc[:, 1:].to_numpy(dtype=float)
+    valores[gapRows, gapCols] = gapValues
+    saida.iloc[:, 1:] = valores
+    saida.to_csv(file_path)
+    # Log: linhas antigas dos demais postos, reestimativas e linhas novas dos demais postos
+    arquivo_log = Path(file_path).with_suffix(".log")
+    reestimados = {estado.estacoes[c] for c in colunas}
+    with open(arquivo_log) as file:
+        mantidas = [linha for linha in file
+                    if linha.split(": ", 1)[0].rsplit(", ", 1)[-1] not in reestimados]
+    with open(arquivo_log, "w") as file:
+        file.writelines(mantidas)
+    _acrescentarLog(arquivo_log, gapRows, gapCols, gapDonors, dataPlu.index.values.tolist(),
+                    estado.estacoes)
+    rowsNovas, colsNovas, donorsNovas, indexNovas = falhasNovas
+    mantidas = ~desatualizados[colsNovas]
+    _acrescentarLog(arquivo_log, rowsNovas[mantidas], colsNovas[mantidas], donorsNovas[mantidas],
+                    indexNovas, estado.estacoes)
@@ -0,0 +1,120 @@
+# pFillGaps
+# Copyright (C) [2024] [Cláudio Bielenki Jr]
+#
+# Este programa é software livre; você pode redistribuí-lo e/ou
+# modificá-lo sob os termos da Licença Pública Geral GNU,
+# conforme publicada pela Free Software Foundation; tanto a versão 3
+# da Licença, ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM NENHUMA GARANTIA; nem mesmo a garantia implícita de
+# COMERCIABILIDADE OU ADEQUAÇÃO A UM PROPÓSITO ESPECÍFICO. Consulte a
+# Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU
+# junto com este programa; se não, veja <https://www.gnu.org/licenses/>.
+
+"""Log compacto dos postos doadores usados em cada falha.
+
+Em vez de um dicionário (data, posto) -> lista de nomes, o log guarda
+arrays: linha e posto de cada falha, os doadores como índices dos postos
+(-1 nas sobras), o número de doadores e, opcionalmente, o peso de cada um
+na estimativa (float32 no arquivo). É gravado em binário como <saída>.log.npz; o .log em texto
+é gerado a partir dele quando necessário.
+
+Conversão para texto:
+    python pFillGapLog.py chuva_Fill_Correlation.log.npz
+"""
+
+import argparse
+import sys
+from pathlib import Path
+import numpy as np
+
+NAO_PREENCHIDO = "Não preenchido"
+# Falhas convertidas em texto de cada vez
+_BLOCO_TEXTO = 100000
+
+
+def arquivoLogBinario(arquivo):
+    """Log binário correspondente ao arquivo de saída (<nome>.log.npz)"""
+    return Path(arquivo).with_suffix(".log.npz")
+
+
+def linhasLog(gapRows, gapCols, gapDonors, indexLista, estacoes):
+    """Linhas do .log em texto, uma por falha, no formato "data, posto: doadores" """
+    nomes = list(estacoes)
+    for inicio in range(0, len(gapRows), _BLOCO_TEXTO):
+        fim = inicio + _BLOCO_TEXTO
+        datas = [indexLista[r] for r in gapRows[inicio:fim].tolist()]
+        postos = [nomes[c] for c in gapCols[inicio:fim].tolist()]
+        for data, posto, doadores in zip(datas, postos, gapDonors[inicio:fim].tolist()):
+            usados = ", ".join([nomes[d] for d in doadores if d >= 0]) or NAO_PREENCHIDO
+            yield f"{data}, {posto}: {usados}\n"
+
+
+class LogDoadores:
+    """Doadores de cada falha em arrays de largura fixa"""
+
+    def __init__(self, linhas, postos, doadores, indexLista, estacoes, pesos=None):
+        self.linhas = np.asarray(linhas, dtype=np.int64)
+        self.postos = np.asarray(postos, dtype=np.int32)
+        self.doadores = np.asarray(doadores, dtype=np.int32)
+        self.indexLista = list(indexLista)
+        self.estacoes = [str(e) for e in estacoes]
+        self.pesos = None if pesos is None else np.asarray(pesos, dtype=float)
+
+    def __len__(self):
+        return self.linhas.size
+
+    @property
+    def nDoadores(self):
+        return np.count_nonzero(self.doadores >= 0, axis=1).astype(np.int16)
+
+    def registro(self):
+        """Dicionário (data, posto) -> nomes dos doadores, como no log original"""
+        registro = {}
+        for row, col, doadores in zip(self.linhas.tolist(), self.postos.tolist(),
+                                      self.doadores.tolist()):
+            usados = [self.estacoes[d] for d in doadores if d >= 0] or [NAO_PREENCHIDO]
+            registro[(self.indexLista[row], self.estacoes[col])] = usados
+        return registro
+
+    def salvar(self, arquivo):
+        arrays = {"linhas": self.linhas, "postos": self.postos, "doadores": self.doadores,
+                  "n_doadores": self.nDoadores, "estacoes": np.array(self.estacoes),
+                  "datas": np.array([str(d) for d in self.indexLista])}
+        if self.pesos is not None:
+            arrays["pesos"] = self.pesos.astype(np.float32)
+        with open(arquivo, "wb") as file:
+            np.savez(file, **arrays)
+        return arquivo
+
+    @classmethod
+    def carregar(cls, arquivo):
+        with np.load(arquivo, allow_pickle=False) as npz:
+            return cls(npz["linhas"], npz["postos"], npz["doadores"], npz["datas"].tolist(),
+                       npz["estacoes"].tolist(), npz["pesos"] if "pesos" in npz.files else None)
+
+    def salvarTexto(self, arquivo_log):
+        """Grava o .log em texto, uma linha por falha"""
+        with open(arquivo_log, "w") as file:
+            file.writelines(linhasLog(self.linhas, self.postos, self.doadores, self.indexLista,
+                                      self.estacoes))
+        return arquivo_log
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="pFillGapLog",
+                                     description="Converte o log binário (.log.npz) para o .log em texto")
+    parser.add_argument("log", help="log binário gravado ao lado dos dados preenchidos")
+    parser.add_argument("--output", help="arquivo .log (padrão: mesmo nome, sem o .npz)")
+    args = parser.parse_args(argv)
+    arquivo_log = args.output or Path(args.log).with_suffix("")
+    LogDoadores.carregar(args.log).salvarTexto(arquivo_log)
+    print(f"Log gravado em {arquivo_log}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
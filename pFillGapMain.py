@@ -14,97 +14,36 @@
 # Você deve ter recebido uma cópia da Licença Pública Geral GNU
 # junto com este programa; se não, veja <https://www.gnu.org/licenses/>.
 
-import numpy as np
 from pathlib import Path
-import pandas as pd
-from PyQt5.QtGui import QColor
-import geopandas as gpd
-from pyproj import CRS
-from pyproj.database import query_utm_crs_info
-from pyproj.aoi import AreaOfInterest
+import re
 import sys, os
-from osgeo import ogr
-from PyQt5 import uic
-from PyQt5.QtWidgets import QFileDialog, QSizePolicy, QToolBar
+from PyQt5.QtWidgets import QFileDialog, QSizePolicy, QToolBar, QProgressBar, QLabel, QPushButton, QMessageBox
+from PyQt5.QtWidgets import QDialogButtonBox
 from resources_rc import *
-from PyQt5.QtCore import Qt, QAbstractTableModel
 from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget
 from FillGapDialog import pFillGapDialog
 from creditoDialog import creditoDialog
+from pFillGapProfile import Instrumentacao, ativar, desativar, etapa
+from pFillGapUi import formulario
+from pFillGapWorker import TarefaPreenchimento, formatarTempo
+# NumPy, pandas, GDAL/OGR e pyproj são importados na primeira ação que os usa
+# (openCSV, openSHP e upDate), não na abertura do programa
 if getattr(sys, 'frozen', False):
     # Define PROJ_LIB para o diretório onde o proj.db foi incluído no .spec
     os.environ['PROJ_LIB'] = os.path.join(sys._MEIPASS, 'proj')
     # Define GDAL_DATA para o diretório onde os dados do GDAL foram incluídos no .spec
     os.environ['GDAL_DATA'] = os.path.join(sys._MEIPASS, 'gdal')
 
-# Subclasse de QAbstractTableModel para usar o DataFrame
-class PandasModel(QAbstractTableModel):
-    def __init__(self, data):
-        super(PandasModel, self).__init__()
-        self._data = data
-        # Armazena as localizações das células originalmente NaN
-        self._nan_locations = data.isna()
+# Janela principal compilada do mainFillGaps.ui no build (ver pFillGapUi)
+FORM_MAIN = formulario("mainFillGaps.ui")
 
-    def rowCount(self, parent=None):
-        return self._data.shape[0]
-
-    def columnCount(self, parent=None):
-        return self._data.shape[1]
-
-    def data(self, index, role=Qt.DisplayRole):
-        if not index.isValid():
-            return None
-        value = self._data.iat[index.row(), index.column()]
-        # Centralizar o texto na célula
-        if role == Qt.TextAlignmentRole:
-            return Qt.AlignCenter
-        # Exibir o valor formatado em três casas decimais, se for um número
-        if role == Qt.DisplayRole:
-            if isinstance(value, (int, float)):
-                return f"{value:.3f}"  # Formata para 3 casas decimais
-            return str(value)  # Exibe outros valores como strings
-        # Exibir o valor em formato de string
-        if role == Qt.DisplayRole:
-            return str(value)
-        # Verificar a localização original de NaN e aplicar destaque
-        if role == Qt.BackgroundRole and self._nan_locations.iat[index.row(), index.column()]:
-            return QColor(140, 200, 255)  # Azul claro para células originalmente NaN
-        return None
-
-    def headerData(self, section, orientation, role=Qt.DisplayRole):
-        if role == Qt.DisplayRole:
-            if orientation == Qt.Horizontal:
-                return str(self._data.columns[section])
-            elif orientation == Qt.Vertical:
-                return str(self._data.index[section])
-        return None
-
-    def update_data(self, new_data):
-        """Atualiza os dados do modelo e mantém as localizações originais de NaN"""
-        self.beginResetModel()
-        self._data = new_data
-        # Mantém as localizações originais de NaN
-        # Não altere `self._nan_locations` para que o destaque seja preservado
-        self.endResetModel()
-
-class pyFillGaps(QMainWindow):
+class pyFillGaps(QMainWindow, FORM_MAIN):
     def __init__(self):
         super(pyFillGaps, self).__init__()
-        self.preenchimento = None
-        self.arrayDist1 = None
+        self.engine = None
+        self.df = None
         self.dlg = None
-        self.arrayDist = None
-        self.invMatrixDist = None
-        self.matrixDist1 = None
-        self.matrixDist = None
-        self.arrayCorr = None
-        self.matrixCorr = None
         self.columns = None
-        self.stds = None
-        self.means = None
-        self.indexLista = None
-        self.gagePlu = None
-        self.rows = None
         self.indexSHP = None
         self.indexData = None
         self.maxEst = None
@@ -116,7 +55,9 @@ class pyFillGaps(QMainWindow):
         self.fileCSV = None
         self.arquivoCSV = None
         self.distancia = None
-        uic.loadUi("mainFillGaps.ui", self)  # Replace with your .ui file path
+        self.tarefa = None
+        self.instrumentacao = None
+        self.setupUi(self)
         self.toolbar = self.findChild(QToolBar, "toolBar")
         spacer = QWidget()
         spacer.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)  # Expande para preencher o espaço
@@ -131,23 +72,21 @@ class pyFillGaps(QMainWindow):
         self.actionSHP.setEnabled(False)
         self.actionFalhas.setEnabled(False)
         self.actionSalvarCSV.setEnabled(False)
+        # Progresso, tempo restante e cancelamento das tarefas em segundo plano
+        self.progressBar = QProgressBar()
+        self.progressBar.setMaximumWidth(240)
+        self.labelETA = QLabel()
+        self.pbCancelar = QPushButton("Cancelar")
+        self.pbCancelar.clicked.connect(self.cancelarTarefa)
+        for widget in (self.labelETA, self.progressBar, self.pbCancelar):
+            self.statusbar.addPermanentWidget(widget)
+            widget.hide()
 
     def limpar(self):
-        self.preenchimento = None
-        self.arrayDist1 = None
+        self.engine = None
+        self.df = None
         self.dlg = None
-        self.arrayDist = None
-        self.invMatrixDist = None
-        self.matrixDist1 = None
-        self.matrixDist = None
-        self.arrayCorr = None
-        self.matrixCorr = None
         self.columns = None
-        self.stds = None
-        self.means = None
-        self.indexLista = None
-        self.gagePlu = None
-        self.rows = None
         self.indexSHP = None
         self.indexData = None
         self.maxEst = None
@@ -159,11 +98,74 @@ class pyFillGaps(QMainWindow):
         self.fileCSV = None
         self.arquivoCSV = None
         self.distancia = None
+        self.instrumentacao = None
+        desativar()
         self.tableView.setModel(self.model)
         self.actionSHP.setEnabled(False)
         self.actionFalhas.setEnabled(False)
         self.actionSalvarCSV.setEnabled(False)
 
+    def _iniciarTarefa(self, tarefa, mensagem, cancelavel, aoConcluir):
+        """Executa `tarefa` em segundo plano, bloqueando as ações até o fim"""
+        if self.tarefa is not None:
+            # Tarefa anterior já concluída, com a thread ainda encerrando
+            self.tarefa.qthread.wait()
+        self.tarefa = tarefa
+        self._acoes = [(acao, acao.isEnabled()) for acao in
+                       (self.actionCSV, self.actionSHP, self.actionFalhas, self.actionSalvarCSV)]
+        for acao, _ in self._acoes:
+            acao.setEnabled(False)
+        self.progressBar.setRange(0, 0)  # Indicador ocupado até o primeiro aviso
+        self.labelETA.setText("")
+        self.statusbar.showMessage(mensagem)
+        self.progressBar.show()
+        self.labelETA.show()
+        self.pbCancelar.setEnabled(cancelavel)
+        self.pbCancelar.setVisible(cancelavel)
+        tarefa.progresso.connect(self.on_tarefa_progresso)
+        for sinal in (tarefa.concluido, tarefa.falhou, tarefa.cancelado):
+            sinal.connect(self._encerrarTarefa)
+        tarefa.concluido.connect(aoConcluir)
+        tarefa.falhou.connect(self.on_tarefa_falhou)
+        tarefa.cancelado.connect(self.on_tarefa_cancelada)
+        # A referência à tarefa (e à sua QThread) só é solta quando a thread termina
+        tarefa.iniciar(aoTerminar=self._liberarTarefa)
+
+    def _liberarTarefa(self):
+        if self.tarefa is not None and self.tarefa.qthread is self.sender():
+            self.tarefa = None
+
+    def _encerrarTarefa(self, *args):
+        for widget in (self.labelETA, self.progressBar, self.pbCancelar):
+            widget.hide()
+        self.statusbar.clearMessage()
+        for acao, habilitada in self._acoes:
+            acao.setEnabled(habilitada)
+
+    def cancelarTarefa(self):
+        if self.tarefa is not None:
+            self.pbCancelar.setEnabled(False)
+            self.statusbar.showMessage("Cancelando...")
+            self.tarefa.cancelar()
+
+    def on_tarefa_progresso(self, feitas, total, restante):
+        self.progressBar.setRange(0, max(total, 1))
+        self.progressBar.setValue(feitas)
+        self.labelETA.setText(f"{feitas}/{total} falhas - restante {formatarTempo(restante)}")
+
+    def on_tarefa_falhou(self, mensagem):
+        QMessageBox.critical(self, "pFillGaps", mensagem)
+
+    def on_tarefa_cancelada(self):
+        self.statusbar.showMessage("Preenchimento cancelado.", 5000)
+
+    def closeEvent(self, event):
+        # Aguarda a tarefa em andamento para não destruir a thread em execução
+        if self.tarefa is not None:
+            self.tarefa.cancelar()
+            self.tarefa.qthread.wait()
+        super(pyFillGaps, self).closeEvent(event)
+
     def creditos(self):
         self.dlgCreditos = creditoDialog()
         self.dlgCreditos.show()
@@ -171,10 +173,15 @@ class pyFillGaps(QMainWindow):
         if result:
             pass
     def openCSV(self):
+        from pFillGapIO import FILTRO_DADOS, lerDados
+        from pFillGapTabela import PandasModel
         self.arquivoCSV = QFileDialog.getOpenFileName(self, "Select Rainfall Data File Input: ",
-                                                         self.appDir, "*.csv")
+                                                         self.appDir, FILTRO_DADOS)
         self.fileCSV = self.arquivoCSV[0]
-        self.dataPlu = pd.read_csv(self.fileCSV)
+        # Etapas e contadores desta execução; PFILLGAPS_PROFILE=1 ativa também o cProfile
+        self.instrumentacao = ativar(Instrumentacao(perfil=bool(os.environ.get("PFILLGAPS_PROFILE"))))
+        # CSV, Parquet, Feather ou matriz .npy, conforme a extensão
+        self.dataPlu = lerDados(self.fileCSV)
         self.colNames = list(self.dataPlu.columns)
         self.model = PandasModel(self.dataPlu)
         self.tableView.setModel(self.model)
@@ -191,52 +198,39 @@ class pyFillGaps(QMainWindow):
     def openSHP(self):
         # Abre o diálogo para selecionar o shapefile
         arquivoSHP, _ = QFileDialog.getOpenFileName(self, "Select Rainfall Gage File Input:", self.appDir, "*.shp")
-        print("teste 1 passou")
         # Verifica se um arquivo foi selecionado
         if not arquivoSHP:
             print("Nenhum arquivo selecionado.")
             return  # Sai da função se a seleção foi cancelada
         self.shapefile = arquivoSHP  # Atribui o caminho do shapefile selecionado
         self.field_names = []  # Inicializa a lista de nomes de campos
-        print("teste 2 passou")
         # Verifica se o arquivo existe
         if not os.path.exists(self.shapefile):
             print(f"Erro: O arquivo {self.shapefile} não foi encontrado.")
             return
+        from osgeo import ogr
         # Carrega o driver do shapefile
         driver = ogr.GetDriverByName('ESRI Shapefile')
         if driver is None:
             print("Erro: Driver 'ESRI Shapefile' não encontrado.")
             return
-        print(self.shapefile)
-        print("teste 3 passou")
-        # Abre o shapefile
-        datasource = driver.Open(self.shapefile, 0)  # 0 para leitura
-        if datasource is None:
-            print("Erro: não foi possível abrir o shapefile.")
-            return
-        print("teste 4 passou")
-        # Verifica se o datasource foi carregado com sucesso
-        if datasource is None:
-            print("Erro: não foi possível abrir o shapefile.")
-            return
-        print("teste 5 passou")
-        # Obtém a camada (layer) do shapefile
-        shapefile_layer = datasource.GetLayer()
-        if shapefile_layer:
-            print("shapefile_layer carregado com sucesso.")
-            layer_def = shapefile_layer.GetLayerDefn()
-            if layer_def is not None:
-                print("Obtendo nomes dos campos de atributos...")
-                for i in range(layer_def.GetFieldCount()):
-                    name = layer_def.GetFieldDefn(i).GetName()
-                    print(f"Campo: {name}")
-                    self.field_names.append(name)
+        with etapa("campos_shapefile"):
+            # Abre o shapefile
+            datasource = driver.Open(self.shapefile, 0)  # 0 para leitura
+            if datasource is None:
+                print("Erro: não foi possível abrir o shapefile.")
+                return
+            # Obtém a camada (layer) do shapefile
+            shapefile_layer = datasource.GetLayer()
+            if shapefile_layer:
+                layer_def = shapefile_layer.GetLayerDefn()
+                if layer_def is not None:
+                    for i in range(layer_def.GetFieldCount()):
+                        self.field_names.append(layer_def.GetFieldDefn(i).GetName())
+                else:
+                    print("Erro: Não foi possível obter a definição da camada (layer_def).")
             else:
-                print("Erro: Não foi possível obter a definição da camada (layer_def).")
-        else:
-            print("Erro: shapefile_layer não foi carregado.")
-        print("teste 6 passou")
+                print("Erro: shapefile_layer não foi carregado.")
         self.actionFalhas.setEnabled(True)
         print(self.field_names)
         print(self.fileCSV)
@@ -251,38 +245,24 @@ class pyFillGaps(QMainWindow):
         self.dlg.labelGage.setText(str(value))
 
     def upDate(self):
+        from pFillGapCache import ajustarComCache
         self.dlg.pbUpDate.setEnabled(False)
         self.distancia = 0
         self.maxEst = 1
         self.indexData = self.dlg.comboBoxDate.currentText()
         self.indexSHP = self.dlg.comboBoxCode.currentText()
         self.dataPlu.set_index(self.indexData, inplace=True)
-        self.gagePlu = gpd.read_file(self.shapefile)
-        self.gagePlu.set_index(self.indexSHP)
-        print("teste 1")
-        self.indexLista = self.dataPlu.index.values.tolist()
-        srid = CRS(self.gagePlu.crs)
-        print("teste 2")
-        if srid.coordinate_system.name == 'ellipsoidal':
-            extent = self.gagePlu.total_bounds
-            utm_crs_list = query_utm_crs_info(datum_name="WGS 84",
-                                              area_of_interest=AreaOfInterest(west_lon_degree=extent[0],
-                                                                              south_lat_degree=extent[1],
-                                                                              east_lon_degree=extent[2],
-                                                                              north_lat_degree=extent[3], ), )
-            utm_crs = CRS.from_epsg(utm_crs_list[0].code)
-            self.gagePlu = self.gagePlu.to_crs(utm_crs)
-        self.means = self.dataPlu.mean()
-        self.stds = self.dataPlu.std()
-        # colNames = list(dataPlu.columns)
-        self.rows, self.columns = self.dataPlu.shape
-        self.matrixCorr = self.dataPlu.corr()
-        self.arrayCorr = self.matrixCorr.to_numpy(dtype=float)
-        self.matrixDist = self.gagePlu.geometry.apply(lambda g: (self.gagePlu.distance(g)))
-        # Converte para array NumPy se não estiver
-        self.matrixDist1 = self.matrixDist.to_numpy(dtype=float)
-        # Encontra o valor máximo
-        maxDist = int(np.ceil((np.max(self.matrixDist1)) / 1000) * 1000)
+        self.columns = self.dataPlu.shape[1]
+        # Estatísticas e coordenadas reaproveitadas do cache quando as entradas não mudaram
+        tarefa = TarefaPreenchimento(ajustarComCache, self.dataPlu, self.fileCSV, self.shapefile,
+                                     self.indexData, self.indexSHP)
+        tarefa.falhou.connect(lambda mensagem: self.dlg.pbUpDate.setEnabled(True))
+        self._iniciarTarefa(tarefa, "Calculando estatísticas dos postos...", cancelavel=False,
+                            aoConcluir=self.on_engine_ajustado)
+
+    def on_engine_ajustado(self, engine):
+        self.engine = engine
+        maxDist = self.engine.maxDist
         self.dlg.labelDistMax.setText(str(maxDist))
         self.dlg.sliderDist.setEnabled(True)
         self.dlg.sliderDist.setMinimum(0)  # Valor mínimo do slider
@@ -296,6 +276,7 @@ class pyFillGaps(QMainWindow):
         self.dlg.sliderGages.setValue(1)
         self.dlg.sliderGages.valueChanged.connect(self.on_sliderGages_value_changed)
         self.dlg.method.setEnabled(True)
+        self.dlg.bbFill.button(QDialogButtonBox.Ok).setEnabled(True)
 
     def pFalhas(self):
         self.dlg = pFillGapDialog()
@@ -311,159 +292,59 @@ class pyFillGaps(QMainWindow):
         for field in self.field_names:
             self.dlg.comboBoxCode.addItem(field)
         self.dlg.pbUpDate.clicked.connect(self.upDate)
+        # OK só depois de calculadas as estatísticas (on_engine_ajustado)
+        self.dlg.bbFill.button(QDialogButtonBox.Ok).setEnabled(False)
         result = self.dlg.exec_()
-        if result:
+        if result and self.engine is not None:
             if self.dlg.rbRPM.isChecked():
                 method = "Mean"
             if self.dlg.rbRPC.isChecked():
                 method = "Correlation"
             if self.dlg.rbIDW.isChecked():
                 method = "InvDist"
-            self.matrixDist1 = np.where((self.matrixDist1 > self.distancia), 0, 1)
-            self.invMatrixDist = 1 / self.matrixDist
-            self.arrayDist1 = self.invMatrixDist.to_numpy(dtype=float)
-            self.arrayDist = np.multiply(self.arrayDist1, self.matrixDist1)
-            for col in range(self.columns):
-                for row in range(self.rows):
-                    if col == row:
-                        self.invMatrixDist[col][row] = 0
-            arrayIndices = np.multiply(self.arrayCorr, self.arrayDist)
-            #arrayIndices = matrixIndices.to_numpy()
-            arrayData = self.dataPlu.to_numpy(dtype=float)
-            arrayDataP = np.copy(arrayData)
-            arrayPosition = []
-            self.preenchimento = {}
-            for col in range(self.columns):
-                pMeans = self.means[col]
-                pStds = self.stds[col]
-                for row in range(self.rows):
-                    if np.isnan(arrayData[row, col]):
-                        chavePreencimento = (self.indexLista[row], self.colNames[col+1])
-                        estPreenchimento = []
-                        arrayPIndicesCopy = np.empty(shape=self.columns)
-                        rowData = np.empty(shape=self.columns)
-                        arrayPMedia = np.empty(shape=self.columns)
-                        arrayPStds = np.empty(shape=self.columns)
-                        arrayPCorr = np.empty(shape=self.columns)
-                        arrayPIndices = np.empty(shape=self.columns)
-                        arrayPDist = np.empty(shape=self.columns)
-                        arraySortIndices = np.empty(shape=self.columns)
-                        precX = 0
-                        for i in range(self.columns):
-                            if not np.isnan(arrayData[row, i]):
-                                rowData[i] = arrayData[row, i]
-                                arrayPMedia[i] = self.means[i]
-                                arrayPStds[i] = self.stds[i]
-                                arrayPCorr[i] = self.arrayCorr[col, i]
-                                arrayPIndices[i] = arrayIndices[col, i]
-                                arrayPDist[i] = self.arrayDist[col, i]
-                            else:
-                                rowData[i] = 0
-                                arrayPMedia[i] = 0
-                                arrayPStds[i] = 0
-                                arrayPCorr[i] = 0
-                                arrayPIndices[i] = 0
-                                arrayPDist[i] = 0
-                        arrayPIndicesCopy = np.copy(arrayPIndices)
-                        arraySortIndices = np.sort(arrayPIndicesCopy)
-                        countNZeros = np.count_nonzero(~np.isnan(arraySortIndices) & (arraySortIndices != 0))
-                        if countNZeros == 0:
-                            estPreenchimento.append("Não preenchido")
-                            self.preenchimento[chavePreencimento] = estPreenchimento
-                            del rowData
-                            del arrayPMedia
-                            del arrayPStds
-                            del arrayPCorr
-                            del arrayPIndices
-                            del arrayPIndicesCopy
-                            del arraySortIndices
-                            continue
-                        estValidas = min(self.maxEst, countNZeros)
-                        arraySelecao = np.empty(shape=estValidas)
-                        Cont = 0
-                        for valor in arraySortIndices:
-                            if valor > 0 and Cont < estValidas - 1:
-                                Cont = Cont + 1
-                                arraySelecao[Cont] = valor
-                        arraySelecao = arraySortIndices[-(estValidas):]
-                        # print(arraySelecao)
-                        arrayPos = []
-                        for item in arraySelecao:
-                            position = np.where(arrayPIndices == item)[0][0]
-                            estPreenchimento.append(self.colNames[position+1])
-                            if method == "Mean":
-                                precX = precX + ((1 / estValidas) * ((pMeans / arrayPMedia[position]) * rowData[position]))
-                            if method == "Correlation":
-                                precX = precX + ((pStds / estValidas) * (
-                                            ((rowData[position] - arrayPMedia[position]) / arrayPStds[position]) *
-                                            arrayPCorr[position]))
-                            if method == "InvDist":
-                                somaDist = 0
-                                for item2 in arraySelecao:
-                                    position2 = np.where(arrayPIndicesCopy == item2)[0][0]
-                                    somaDist = somaDist + arrayPDist[position2]
-                                precX = precX + ((arrayPDist[position] / somaDist) * rowData[position])
-                        if method == "Mean":
-                            arrayDataP[row, col] = precX
-                        if method == "Correlation":
-                            arrayDataP[row, col] = precX + pMeans
-                        if method == "InvDist":
-                            arrayDataP[row, col] = precX
-                        self.preenchimento[chavePreencimento] = estPreenchimento
-                        del rowData
-                        del arrayPMedia
-                        del arrayPStds
-                        del arrayPCorr
-                        del arrayPIndices
-                        del arrayPIndicesCopy
-                        del arraySortIndices
-                        del arraySelecao
-            #newName = "_Fill_" + method + ".csv"
-            # Converte indexList para um DataFrame
-            index_df = pd.DataFrame(self.indexLista, columns=[self.colNames[0]])
-            # Converte arrayDataP diretamente para um DataFrame com as colunas apropriadas
-            data_df = pd.DataFrame(arrayDataP, columns=self.colNames[1:])
-            # Concatena os dois DataFrames ao longo das colunas
-            self.df = pd.concat([index_df, data_df], axis=1)
-            # Define a coluna de índice sem removê-la
-            #df.set_index(self.colNames[0], inplace=True, drop=False)
-            #df = pd.DataFrame(data_with_index, columns=self.colNames)
-            self.model.update_data(self.df)
-            self.actionSalvarCSV.setEnabled(True)
+            tarefa = TarefaPreenchimento(self.engine.fill, method, self.distancia, self.maxEst,
+                                         comProgresso=True)
+            self._iniciarTarefa(tarefa, "Preenchendo falhas...", cancelavel=True,
+                                aoConcluir=self.on_preenchimento_concluido)
         pass
 
+    def on_preenchimento_concluido(self, df):
+        self.df = df
+        self.model.update_data(self.df)
+        self.actionSalvarCSV.setEnabled(True)
+
     def salvarCSV(self):
         directory = Path(self.fileCSV).parent
-        file_path, _ = QFileDialog.getSaveFileName(
+        file_path, filtro = QFileDialog.getSaveFileName(
             parent=self,  # Define o widget pai, geralmente `self`
             caption="Salvar arquivo como CSV",  # Título da caixa de diálogo
             directory=str(directory),  # Diretório inicial e sugestão de nome
-            filter="CSV Files (*.csv);",  # Filtros de arquivos
+            filter="CSV Files (*.csv);;Parquet (*.parquet);;Feather (*.feather);;NumPy (*.npy)",  # Filtros de arquivos
             options=QFileDialog.Options()  # Opções adicionais
         )
         # Verifica se o usuário escolheu um arquivo
-        if file_path:
-            print("Arquivo escolhido:", file_path)
-        else:
+        if not file_path:
             print("Nenhum arquivo foi escolhido.")
-        self.df.to_csv(file_path)
-        # Nome do arquivo onde os dados serão gravados
-        log_path = Path(file_path).with_suffix(".log")
-        arquivo_log = log_path
-        # Abrindo o arquivo em modo de escrita
-        with open(arquivo_log, "w") as file:
-            # Iterando sobre o dicionário e gravando cada item
-            for (data, codigo_estacao), estacoes_usadas in self.preenchimento.items():
-                # Formata a linha a ser escrita
-                linha = f"{data}, {codigo_estacao}: {', '.join(estacoes_usadas)}\n"
-                # Escreve a linha no arquivo
-                file.write(linha)
+            return
+        # Sem extensão reconhecida, usa a do filtro escolhido (CSV por padrão)
+        from pFillGapIO import comExtensao
+        extensao = re.search(r"\*(\.\w+)", filtro or "")
+        file_path = comExtensao(file_path, extensao.group(1) if extensao else ".csv")
+        print("Arquivo escolhido:", file_path)
+        # Grava os dados e o log de preenchimento ao lado (.log.npz e .log em CSV, ou tabela
+        # no formato escolhido)
+        arquivo_log = self.engine.salvar(file_path, logTexto=True)
         print(f"Dados gravados com sucesso em {arquivo_log}.")
+        if self.instrumentacao is not None:
+            # Tempos de cada etapa e contadores ao lado do log
+            arquivos = self.instrumentacao.salvar(file_path)
+            print("Relatório de tempos em " + ", ".join(str(a) for a in arquivos) + ".")
         self.limpar()
         pass
 
-app = QApplication(sys.argv)
-window = pyFillGaps()
-window.show()
-window.creditos()
-sys.exit(app.exec_())
\ No newline at end of file
+if __name__ == "__main__":
+    app = QApplication(sys.argv)
+    window = pyFillGaps()
+    window.show()
+    window.creditos()
+    sys.exit(app.exec_())
\ No newline at end of file
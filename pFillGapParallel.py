@@ -0,0 +1,132 @@
+# pFillGaps
+# Copyright (C) [2024] [Cláudio Bielenki Jr]
+#
+# Este programa é software livre; você pode redistribuí-lo e/ou
+# modificá-lo sob os termos da Licença Pública Geral GNU,
+# conforme publicada pela Free Software Foundation; tanto a versão 3
+# da Licença, ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM NENHUMA GARANTIA; nem mesmo a garantia implícita de
+# COMERCIABILIDADE OU ADEQUAÇÃO A UM PROPÓSITO ESPECÍFICO. Consulte a
+# Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU
+# junto com este programa; se não, veja <https://www.gnu.org/licenses/>.
+
+"""Preenchimento de falhas em paralelo, dividindo os postos entre processos.
+
+As matrizes de dados, correlação e pesos de distância (densos ou a
+vizinhança esparsa de pFillGapSpatial) são colocadas em
+memória compartilhada uma única vez; cada processo recebe apenas a lista de
+postos que deve preencher. Os resultados são reunidos na ordem dos postos,
+de modo que valores e log são idênticos aos do processamento serial.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from pFillGapCore import RankingDoadores, _preencherPostos
+from pFillGapSpatial import PesosVizinhos
+
+# Matrizes compartilhadas anexadas em cada processo de trabalho
+_matrizes = {}
+_blocosMemoria = []
+
+
+def _compartilhar(arrays):
+    """Copia os arrays para blocos de memória compartilhada"""
+    blocos, descritores = [], {}
+    for nome, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+        blocos.append(shm)
+        descritores[nome] = (shm.name, array.shape, array.dtype.str)
+    return blocos, descritores
+
+
+def _iniciarWorker(descritores):
+    for nome, (shmName, shape, dtype) in descritores.items():
+        shm = shared_memory.SharedMemory(name=shmName)
+        _blocosMemoria.append(shm)
+        _matrizes[nome] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _preencherTarefa(colunas, maxEst, method, blockSize, agrupar, pesos):
+    m = _matrizes
+    if "arrayDist" in m:
+        arrayDist = m["arrayDist"]
+    else:
+        arrayDist = PesosVizinhos(m["indptr"], m["indices"], m["pesos"])
+    ranking = RankingDoadores(m["rankingIndptr"], m["rankingPosicoes"])
+    return _preencherPostos(m["arrayData"], m["arrayCorr"], arrayDist, m["means"], m["stds"],
+                            maxEst, method, colunas, blockSize, agrupar=agrupar, pesos=pesos,
+                            ranking=ranking)
+
+
+def dividirPostos(arrayData, partes):
+    """Divide os postos em até `partes` grupos contíguos com número parecido de falhas"""
+    falhas = np.count_nonzero(np.isnan(arrayData), axis=0)
+    nEst = falhas.size
+    if nEst == 0:
+        return []
+    acumulado = np.cumsum(falhas)
+    total = acumulado[-1]
+    if total == 0:
+        return [np.arange(nEst)]
+    cortes = np.searchsorted(acumulado, total * np.arange(1, partes) / partes, side="right")
+    grupos = np.split(np.arange(nEst), np.unique(cortes))
+    return [g for g in grupos if g.size]
+
+
+def preencherPostosParalelo(arrayData, arrayCorr, arrayDist, means, stds, maxEst, method,
+                            blockSize, workers=None, progresso=None, agrupar=True, pesos=False,
+                            ranking=None):
+    """Versão paralela de pFillGapCore._preencherPostos para todos os postos.
+
+    `progresso` é chamado no processo principal a cada grupo de postos
+    concluído; uma exceção levantada por ele cancela os grupos pendentes.
+    O ranking dos doadores (calculado aqui se não informado) também vai para
+    a memória compartilhada.
+    """
+    workers = workers or os.cpu_count() or 1
+    # Mais grupos que processos para equilibrar postos com muitas falhas
+    grupos = dividirPostos(arrayData, 4 * workers)
+    if ranking is None:
+        ranking = RankingDoadores.calcular(arrayCorr, arrayDist)
+    arrays = {"arrayData": arrayData, "arrayCorr": arrayCorr, "means": means, "stds": stds,
+              "rankingIndptr": ranking.indptr, "rankingPosicoes": ranking.posicoes}
+    if isinstance(arrayDist, PesosVizinhos):
+        arrays.update(indptr=arrayDist.indptr, indices=arrayDist.indices, pesos=arrayDist.pesos)
+    else:
+        arrays["arrayDist"] = arrayDist
+    blocos, descritores = _compartilhar(arrays)
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_iniciarWorker,
+                                   initargs=(descritores,))
+    try:
+        resultados = []
+        feitas = 0
+        for resultado in executor.map(_preencherTarefa, grupos, [maxEst] * len(grupos),
+                                      [method] * len(grupos), [blockSize] * len(grupos),
+                                      [agrupar] * len(grupos), [pesos] * len(grupos)):
+            resultados.append(resultado)
+            feitas += resultado[0].size
+            if progresso is not None:
+                progresso(feitas)
+    except BaseException:
+        executor.shutdown(wait=True, cancel_futures=True)
+        raise
+    else:
+        executor.shutdown(wait=True)
+    finally:
+        for shm in blocos:
+            shm.close()
+            shm.unlink()
+    if not resultados:
+        resultado = (np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0),
+                     np.empty((0, maxEst), dtype=int))
+        return resultado + (np.empty((0, maxEst)),) if pesos else resultado
+    # executor.map preserva a ordem dos grupos, que segue a ordem dos postos
+    return tuple(np.concatenate(partes) for partes in zip(*resultados))
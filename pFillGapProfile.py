@@ -0,0 +1,155 @@
+# pFillGaps
+# Copyright (C) [2024] [Cláudio Bielenki Jr]
+#
+# Este programa é software livre; você pode redistribuí-lo e/ou
+# modificá-lo sob os termos da Licença Pública Geral GNU,
+# conforme publicada pela Free Software Foundation; tanto a versão 3
+# da Licença, ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM NENHUMA GARANTIA; nem mesmo a garantia implícita de
+# COMERCIABILIDADE OU ADEQUAÇÃO A UM PROPÓSITO ESPECÍFICO. Consulte a
+# Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU
+# junto com este programa; se não, veja <https://www.gnu.org/licenses/>.
+
+"""Instrumentação das etapas do preenchimento.
+
+Os módulos marcam etapas com `with etapa("nome"):` e somam contadores com
+`contar("nome", n)`. Sem uma Instrumentacao ativa (ver `ativar`) as duas
+chamadas não fazem nada. O relatório é gravado ao lado dos dados de saída
+como <nome>.tempos.json e <nome>.tempos.csv, e o cProfile opcional como
+<nome>.prof.
+"""
+
+import cProfile
+import csv
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_ativa = None
+
+
+def _rssMaximo():
+    """Pico de memória residente do processo, em MiB (None se indisponível)"""
+    if resource is None:
+        return None
+    # ru_maxrss em KiB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Instrumentacao:
+    """Etapas (início, duração, memória) e contadores de uma execução.
+
+    Com `memoria`, o tracemalloc registra o pico de memória alocada até o fim
+    de cada etapa, reiniciado a cada etapa de primeiro nível. Com `perfil`, as
+    etapas de primeiro nível são executadas sob o cProfile.
+    """
+
+    def __init__(self, memoria=False, perfil=False):
+        self.memoria = memoria
+        self.etapas = []
+        self.contadores = {}
+        self.perfil = cProfile.Profile() if perfil else None
+        self._inicio = time.perf_counter()
+        self._trava = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def etapa(self, nome):
+        pilha = getattr(self._local, "pilha", None)
+        if pilha is None:
+            pilha = self._local.pilha = []
+        primeiroNivel = not pilha
+        perfilar = self.perfil is not None and primeiroNivel
+        if primeiroNivel and self.memoria and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        pilha.append(nome)
+        if perfilar:
+            self.perfil.enable()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracao = time.perf_counter() - inicio
+            if perfilar:
+                self.perfil.disable()
+            registro = {"etapa": "/".join(pilha), "inicio": inicio - self._inicio,
+                        "duracao": duracao, "rss_max_mb": _rssMaximo()}
+            if self.memoria and tracemalloc.is_tracing():
+                registro["pico_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            pilha.pop()
+            with self._trava:
+                self.etapas.append(registro)
+
+    def contar(self, nome, n=1):
+        with self._trava:
+            self.contadores[nome] = self.contadores.get(nome, 0) + int(n)
+
+    def relatorio(self):
+        etapas = sorted(self.etapas, key=lambda r: r["inicio"])
+        return {"etapas": etapas, "contadores": dict(self.contadores), "rss_max_mb": _rssMaximo()}
+
+    def salvar(self, file_path):
+        """Grava o relatório ao lado de `file_path`; retorna os arquivos gravados"""
+        json_path, csv_path, prof_path = arquivosRelatorio(file_path)
+        relatorio = self.relatorio()
+        with open(json_path, "w", encoding="utf-8") as file:
+            json.dump(relatorio, file, indent=1)
+        campos = ["etapa", "inicio", "duracao", "rss_max_mb", "pico_mb"]
+        with open(csv_path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.DictWriter(file, fieldnames=campos)
+            writer.writeheader()
+            writer.writerows(relatorio["etapas"])
+            for nome, valor in relatorio["contadores"].items():
+                writer.writerow({"etapa": f"contador/{nome}", "duracao": valor})
+        arquivos = [json_path, csv_path]
+        if self.perfil is not None:
+            self.perfil.dump_stats(str(prof_path))
+            arquivos.append(prof_path)
+        return arquivos
+
+
+def arquivosRelatorio(file_path):
+    """Relatório JSON, CSV e perfil correspondentes ao arquivo de saída"""
+    file_path = Path(file_path)
+    return (file_path.with_suffix(".tempos.json"), file_path.with_suffix(".tempos.csv"),
+            file_path.with_suffix(".prof"))
+
+
+def ativar(instrumentacao):
+    """Torna `instrumentacao` a destinatária das etapas e contadores"""
+    global _ativa
+    desativar()
+    if instrumentacao.memoria and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _ativa = instrumentacao
+    return instrumentacao
+
+
+def desativar():
+    global _ativa
+    if _ativa is not None and _ativa.memoria and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _ativa = None
+
+
+def etapa(nome):
+    if _ativa is None:
+        return nullcontext()
+    return _ativa.etapa(nome)
+
+
+def contar(nome, n=1):
+    if _ativa is not None:
+        _ativa.contar(nome, n)
@@ -0,0 +1,139 @@
+# pFillGaps
+# Copyright (C) [2024] [Cláudio Bielenki Jr]
+#
+# Este programa é software livre; você pode redistribuí-lo e/ou
+# modificá-lo sob os termos da Licença Pública Geral GNU,
+# conforme publicada pela Free Software Foundation; tanto a versão 3
+# da Licença, ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM NENHUMA GARANTIA; nem mesmo a garantia implícita de
+# COMERCIABILIDADE OU ADEQUAÇÃO A UM PROPÓSITO ESPECÍFICO. Consulte a
+# Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU
+# junto com este programa; se não, veja <https://www.gnu.org/licenses/>.
+
+"""Busca de postos vizinhos por raio com índice espacial.
+
+Substitui a matriz densa de distâncias entre todos os postos: cada posto
+guarda apenas os vizinhos dentro do raio de busca, em formato CSR. Usa o
+cKDTree do SciPy quando disponível e, sem ele, uma busca por blocos em NumPy.
+"""
+
+import numpy as np
+
+# Linhas da matriz de distâncias calculadas de cada vez na busca sem SciPy
+_BLOCO = 1024
+
+
+def _distancias(coords, origem, destinos):
+    # Mesma conta da distância entre pontos do GEOS
+    dx = coords[destinos, 0] - coords[origem, 0]
+    dy = coords[destinos, 1] - coords[origem, 1]
+    return np.sqrt(dx * dx + dy * dy)
+
+
+class PesosVizinhos:
+    """Vizinhos de cada posto (CSR) e o peso inverso da distância de cada um"""
+
+    def __init__(self, indptr, indices, pesos):
+        self.indptr = indptr
+        self.indices = indices
+        self.pesos = pesos
+
+    @property
+    def nEst(self):
+        return self.indptr.size - 1
+
+    def vizinhos(self, col):
+        inicio, fim = self.indptr[col], self.indptr[col + 1]
+        return self.indices[inicio:fim], self.pesos[inicio:fim]
+
+    def contagens(self):
+        """Número de candidatos a doador de cada posto"""
+        return np.diff(self.indptr)
+
+
+class VizinhancaPostos:
+    """Índice espacial das coordenadas projetadas (metros) dos postos"""
+
+    def __init__(self, coords):
+        self.coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+        self._arvore = None
+        self._maxDist = None
+
+    @property
+    def nEst(self):
+        return self.coords.shape[0]
+
+    def _kdtree(self):
+        if self._arvore is None:
+            try:
+                from scipy.spatial import cKDTree
+            except ImportError:
+                self._arvore = False
+            else:
+                self._arvore = cKDTree(self.coords)
+        return self._arvore
+
+    def _candidatosRaio(self, distancia):
+        """Para cada posto, índices (em ordem crescente) a no máximo `distancia`"""
+        arvore = self._kdtree()
+        if arvore is not False:
+            # Margem para erros de arredondamento; o corte exato é feito depois
+            raio = distancia * (1 + 1e-9) + 1e-9
+            for col, vizinhos in enumerate(arvore.query_ball_point(self.coords, raio)):
+                yield col, np.sort(np.asarray(vizinhos, dtype=np.intp))
+            return
+        todos = np.arange(self.nEst)
+        for inicio in range(0, self.nEst, _BLOCO):
+            bloco = self.coords[inicio:inicio + _BLOCO]
+            dx = bloco[:, None, 0] - self.coords[None, :, 0]
+            dy = bloco[:, None, 1] - self.coords[None, :, 1]
+            dentro = (dx * dx + dy * dy) <= (distancia * (1 + 1e-9) + 1e-9) ** 2
+            for k, linha in enumerate(dentro):
+                yield inicio + k, todos[linha]
+
+    def raio(self, distancia):
+        """Vizinhos de cada posto a até `distancia` metros e seus pesos (1/d).
+
+        O próprio posto é excluído; postos coincidentes recebem peso infinito,
+        como na matriz densa.
+        """
+        indptr = np.zeros(self.nEst + 1, dtype=np.intp)
+        indices, pesos = [], []
+        for col, vizinhos in self._candidatosRaio(distancia):
+            vizinhos = vizinhos[vizinhos != col]
+            dist = _distancias(self.coords, col, vizinhos)
+            dentro = dist <= distancia
+            indices.append(vizinhos[dentro])
+            with np.errstate(divide="ignore"):
+                pesos.append(1 / dist[dentro])
+            indptr[col + 1] = indptr[col] + np.count_nonzero(dentro)
+        if not indices:
+            return PesosVizinhos(indptr, np.empty(0, dtype=np.intp), np.empty(0))
+        return PesosVizinhos(indptr, np.concatenate(indices), np.concatenate(pesos))
+
+    @property
+    def maxDist(self):
+        """Maior distância entre dois postos"""
+        if self._maxDist is None:
+            extremos = np.arange(self.nEst)
+            if self._kdtree() is not False and self.nEst > 3:
+                # O par mais distante está entre os vértices do fecho convexo
+                from scipy.spatial import ConvexHull
+                try:
+                    extremos = ConvexHull(self.coords).vertices
+                except Exception:
+                    # Pontos alinhados ou repetidos: sem fecho, usa todos
+                    pass
+            maior = 0.0
+            for inicio in range(0, extremos.size, _BLOCO):
+                bloco = extremos[inicio:inicio + _BLOCO]
+                dx = self.coords[bloco, None, 0] - self.coords[None, extremos, 0]
+                dy = self.coords[bloco, None, 1] - self.coords[None, extremos, 1]
+                if bloco.size:
+                    maior = max(maior, float(np.sqrt(dx * dx + dy * dy).max()))
+            self._maxDist = maior
+        return self._maxDist
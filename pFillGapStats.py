@@ -0,0 +1,178 @@
+# pFillGaps
+# Copyright (C) [2024] [Cláudio Bielenki Jr]
+#
+# Este programa é software livre; você pode redistribuí-lo e/ou
+# modificá-lo sob os termos da Licença Pública Geral GNU,
+# conforme publicada pela Free Software Foundation; tanto a versão 3
+# da Licença, ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM NENHUMA GARANTIA; nem mesmo a garantia implícita de
+# COMERCIABILIDADE OU ADEQUAÇÃO A UM PROPÓSITO ESPECÍFICO. Consulte a
+# Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU
+# junto com este programa; se não, veja <https://www.gnu.org/licenses/>.
+
+"""Estatísticas dos postos acumuladas por blocos de linhas.
+
+Permite calcular médias, desvios padrão e a correlação de Pearson com pares
+completos (mesma definição de DataFrame.mean/std/corr) sem manter a série
+inteira em memória. As somas por par são produtos de matrizes (BLAS) sobre a
+máscara de dados disponíveis, o que substitui o laço par a par do
+DataFrame.corr.
+"""
+
+import numpy as np
+
+# Elementos (linhas x postos) de cada bloco lido por correlacaoPareada
+ELEMENTOS_BLOCO = 1 << 22
+# Máximo de linhas por bloco: o erro de arredondamento das somas de um bloco
+# cresce com o número de linhas (ver MomentosPareados._semVariancia)
+LINHAS_BLOCO = 16384
+
+
+class MomentosPareados:
+    """Somas por par de postos, restritas às linhas em que ambos têm dado.
+
+    Para cada par (i, j) guarda o número de linhas comuns, a soma e a soma
+    dos quadrados de i nessas linhas e a soma dos produtos. Os dados são
+    deslocados pela média do primeiro bloco para reduzir o cancelamento
+    numérico.
+
+    `dtype` é o tipo dos blocos e dos produtos de matrizes (float32 é cerca de
+    duas vezes mais rápido e usa metade da memória); as somas de cada bloco
+    têm erro relativo de até eps*linhas do bloco e são acumuladas em float64.
+    `blocoColunas` limita o número de postos de cada produto, reduzindo as
+    matrizes temporárias em redes muito largas.
+    """
+
+    def __init__(self, nEst, dtype=np.float64, blocoColunas=None):
+        self.nEst = nEst
+        self.dtype = np.dtype(dtype)
+        self.blocoColunas = blocoColunas
+        self.deslocamento = None
+        self.linhas = 0
+        self.maxLinhasBloco = 0
+        self.n = np.zeros((nEst, nEst))
+        self.sx = np.zeros((nEst, nEst))
+        self.sxx = np.zeros((nEst, nEst))
+        self.sxy = np.zeros((nEst, nEst))
+
+    def atualizar(self, arrayData):
+        """Acumula um bloco de linhas (postos nas colunas, NaN nas falhas)"""
+        arrayData = np.asarray(arrayData, dtype=self.dtype)
+        disponivel = ~np.isnan(arrayData)
+        if self.deslocamento is None:
+            contagem = disponivel.sum(axis=0)
+            soma = np.where(disponivel, arrayData, 0).sum(axis=0, dtype=float)
+            self.deslocamento = np.divide(soma, contagem, out=np.zeros(self.nEst), where=contagem > 0)
+        mascara = disponivel.astype(self.dtype)
+        centrado = arrayData - self.deslocamento.astype(self.dtype)
+        centrado[~disponivel] = 0
+        quadrado = centrado * centrado
+        passo = self.blocoColunas or self.nEst
+        for i in range(0, self.nEst, passo):
+            bi = slice(i, i + passo)
+            for j in range(0, self.nEst, passo):
+                bj = slice(j, j + passo)
+                self.n[bi, bj] += mascara[:, bi].T @ mascara[:, bj]
+                self.sx[bi, bj] += centrado[:, bi].T @ mascara[:, bj]
+                self.sxx[bi, bj] += quadrado[:, bi].T @ mascara[:, bj]
+                self.sxy[bi, bj] += centrado[:, bi].T @ centrado[:, bj]
+        self.linhas += arrayData.shape[0]
+        self.maxLinhasBloco = max(self.maxLinhasBloco, arrayData.shape[0])
+        return self
+
+    def paraArrays(self):
+        """Somas acumuladas como arrays, para gravar e retomar a acumulação"""
+        return {"deslocamento": self.deslocamento, "linhas": self.linhas,
+                "maxLinhasBloco": self.maxLinhasBloco, "n": self.n, "sx": self.sx, "sxx": self.sxx,
+                "sxy": self.sxy}
+
+    @classmethod
+    def deArrays(cls, arrays):
+        momentos = cls(arrays["n"].shape[0])
+        momentos.deslocamento = np.asarray(arrays["deslocamento"], dtype=float)
+        momentos.linhas = int(arrays["linhas"])
+        # Estados gravados antes de maxLinhasBloco: limite conservador
+        momentos.maxLinhasBloco = int(arrays["maxLinhasBloco"]) if "maxLinhasBloco" in arrays \
+            else momentos.linhas
+        for nome in ("n", "sx", "sxx", "sxy"):
+            setattr(momentos, nome, np.array(arrays[nome], dtype=float))
+        return momentos
+
+    @property
+    def contagens(self):
+        """Número de dados de cada posto"""
+        return np.diag(self.n).copy()
+
+    @property
+    def sobreposicao(self):
+        """Número de linhas em que cada par de postos tem dado"""
+        return np.rint(self.n).astype(np.int64)
+
+    def medias(self):
+        n = np.diag(self.n)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            medias = self.deslocamento + np.diag(self.sx) / n
+        return np.where(n > 0, medias, np.nan)
+
+    def _semVariancia(self, soma2, n, sxx):
+        """Soma de quadrados centrada `soma2` indistinguível de zero.
+
+        `soma2` = sxx - sx²/n cancela quase por completo num posto constante
+        e sobra o resíduo de arredondamento das somas, formadas bloco a bloco
+        em `dtype`: até eps*linhas*sxx, com as linhas do maior bloco (ou as
+        linhas comuns do par, se menos). Abaixo disso não há variância a
+        distinguir do arredondamento.
+        """
+        linhas = np.minimum(n, self.maxLinhasBloco)
+        return soma2 <= np.finfo(self.dtype).eps * linhas * sxx
+
+    def desvios(self):
+        """Desvio padrão amostral (ddof=1)"""
+        n = np.diag(self.n)
+        sx = np.diag(self.sx)
+        sxx = np.diag(self.sxx)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            soma2 = sxx - sx * sx / n
+            var = np.where(self._semVariancia(soma2, n, sxx), 0, soma2) / (n - 1)
+        return np.where(n > 1, np.sqrt(var), np.nan)
+
+    def correlacao(self, minSobreposicao=2):
+        """Correlação de Pearson com pares completos.
+
+        NaN sem variância nas linhas comuns (ver _semVariancia) ou com menos de
+        `minSobreposicao` linhas comuns (um par sem correlação não é escolhido
+        como doador).
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sx, sy = self.sx, self.sx.T
+            cov = self.sxy - sx * sy / self.n
+            vx = self.sxx - sx * sx / self.n
+            vy = self.sxx.T - sy * sy / self.n
+            corr = cov / np.sqrt(vx * vy)
+            constante = self._semVariancia(vx, self.n, self.sxx) | self._semVariancia(vy, self.n, self.sxx.T)
+        valido = (self.n > 1) & (self.n >= minSobreposicao) & ~constante
+        # Correlação do posto com ele mesmo: 1, sem o arredondamento das somas
+        np.fill_diagonal(corr, 1)
+        return np.where(valido, np.clip(corr, -1, 1), np.nan)
+
+
+def correlacaoPareada(arrayData, dtype=np.float64, blocoColunas=None, minSobreposicao=2,
+                      blocoLinhas=None):
+    """Correlação com pares completos e sobreposição de cada par, numa passada.
+
+    Equivale a DataFrame.corr(min_periods=minSobreposicao); ver MomentosPareados.
+    `arrayData` (array ou DataFrame) é lido em blocos de `blocoLinhas` linhas
+    (padrão: ELEMENTOS_BLOCO elementos, até LINHAS_BLOCO linhas), convertidos
+    um a um para `dtype`, sem cópia da matriz inteira.
+    """
+    nLinhas, nEst = np.shape(arrayData)
+    blocoLinhas = blocoLinhas or max(1, min(LINHAS_BLOCO, ELEMENTOS_BLOCO // max(nEst, 1)))
+    linhas = getattr(arrayData, "iloc", arrayData)
+    momentos = MomentosPareados(nEst, dtype, blocoColunas)
+    for inicio in range(0, nLinhas, blocoLinhas):
+        momentos.atualizar(np.asarray(linhas[inicio:inicio + blocoLinhas], dtype=dtype))
+    return momentos.correlacao(minSobreposicao), momentos.sobreposicao
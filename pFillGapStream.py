@@ -0,0 +1,119 @@
+# pFillGaps
+# Copyright (C) [2024] [Cláudio Bielenki Jr]
+#
+# Este programa é software livre; você pode redistribuí-lo e/ou
+# modificá-lo sob os termos da Licença Pública Geral GNU,
+# conforme publicada pela Free Software Foundation; tanto a versão 3
+# da Licença, ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM NENHUMA GARANTIA; nem mesmo a garantia implícita de
+# COMERCIABILIDADE OU ADEQUAÇÃO A UM PROPÓSITO ESPECÍFICO. Consulte a
+# Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU
+# junto com este programa; se não, veja <https://www.gnu.org/licenses/>.
+
+"""Preenchimento de falhas em duas passadas sobre o CSV, por blocos de linhas.
+
+A primeira passada acumula médias, desvios e correlações (pFillGapStats);
+a segunda preenche cada bloco e grava o CSV e o log de saída. A memória
+usada depende do tamanho do bloco e do número de postos, não do comprimento
+da série.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from pFillGapCore import RankingDoadores, preencherFalhas
+from pFillGapLog import linhasLog
+from pFillGapProfile import etapa
+from pFillGapSpatial import VizinhancaPostos
+from pFillGapStats import MomentosPareados
+
+
+def _blocos(fileCSV, indexData, chunksize):
+    for chunk in pd.read_csv(fileCSV, chunksize=chunksize):
+        if indexData is None:
+            indexData = chunk.columns[0]
+        yield chunk.set_index(indexData)
+
+
+def estatisticasCSV(fileCSV, indexData=None, chunksize=100000):
+    """Primeira passada: retorna os nomes dos postos e os momentos acumulados"""
+    momentos = None
+    estacoes = None
+    with etapa("estatisticas"):
+        for chunk in _blocos(fileCSV, indexData, chunksize):
+            if momentos is None:
+                estacoes = [str(c) for c in chunk.columns]
+                momentos = MomentosPareados(len(estacoes))
+            momentos.atualizar(chunk.to_numpy(dtype=float))
+    if momentos is None:
+        raise ValueError(f"{fileCSV} não contém dados")
+    return estacoes, momentos
+
+
+def preencherCSV(fileCSV, file_path, coords, method, distancia, maxEst, indexData=None,
+                 chunksize=100000, workers=1, momentos=None, minSobreposicao=2):
+    """Segunda passada: preenche o CSV bloco a bloco e grava a saída e o log (.log).
+
+    `coords` são as coordenadas projetadas dos postos, na ordem das colunas.
+    Pares com menos de `minSobreposicao` linhas comuns não são doadores.
+
+    O CSV e o log têm o mesmo formato de FillGapsEngine.salvar. O log segue a
+    ordem posto/data: cada bloco é gravado num arquivo temporário e os
+    trechos de cada posto são reunidos no final.
+    """
+    if momentos is None:
+        _, momentos = estatisticasCSV(fileCSV, indexData, chunksize)
+    means = momentos.medias()
+    stds = momentos.desvios()
+    arrayCorr = momentos.correlacao(minSobreposicao)
+    with etapa("vizinhos"):
+        arrayDist = VizinhancaPostos(coords).raio(distancia)
+    # Ranking dos doadores calculado uma vez para todos os blocos
+    with etapa("ranking"):
+        ranking = RankingDoadores.calcular(arrayCorr, arrayDist)
+    arquivo_log = Path(file_path).with_suffix(".log")
+    # trechos[posto] = lista de (início, fim) no arquivo temporário
+    trechos = None
+    offset = 0
+    fd, temporario = tempfile.mkstemp(suffix=".log", dir=Path(file_path).parent)
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            for chunk in _blocos(fileCSV, indexData, chunksize):
+                estacoes = [str(c) for c in chunk.columns]
+                if trechos is None:
+                    if arrayDist.nEst != len(estacoes):
+                        raise ValueError(f"{arrayDist.nEst} coordenadas para {len(estacoes)} postos")
+                    trechos = {estacao: [] for estacao in estacoes}
+                arrayDataP, gapRows, gapCols, gapDonors = preencherFalhas(
+                    chunk.to_numpy(dtype=float), arrayCorr, arrayDist, means, stds, maxEst, method,
+                    workers=workers, ranking=ranking)
+                index_df = pd.DataFrame(chunk.index.values, columns=[chunk.index.name])
+                data_df = pd.DataFrame(arrayDataP, columns=estacoes)
+                df = pd.concat([index_df, data_df], axis=1)
+                df.index = pd.RangeIndex(offset, offset + len(df))
+                df.to_csv(file_path, mode="w" if offset == 0 else "a", header=offset == 0)
+                offset += len(df)
+                # As falhas vêm agrupadas por posto: um trecho por posto neste bloco
+                linhas = linhasLog(gapRows, gapCols, gapDonors, chunk.index.values.tolist(),
+                                   estacoes)
+                cortes = np.flatnonzero(np.diff(gapCols)) + 1
+                for postos in np.split(np.arange(gapCols.size), cortes):
+                    if not postos.size:
+                        continue
+                    inicio = tmp.tell()
+                    tmp.write("".join(next(linhas) for _ in range(postos.size)).encode("utf-8"))
+                    trechos[estacoes[gapCols[postos[0]]]].append((inicio, tmp.tell()))
+        with etapa("gravacao_log"), open(temporario, "rb") as tmp, open(arquivo_log, "w") as file:
+            for estacao, partes in (trechos or {}).items():
+                for inicio, fim in partes:
+                    tmp.seek(inicio)
+                    file.write(tmp.read(fim - inicio).decode("utf-8"))
+    finally:
+        os.remove(temporario)
+    return arquivo_log
@@ -0,0 +1,140 @@
+# pFillGaps
+# Copyright (C) [2024] [Cláudio Bielenki Jr]
+#
+# Este programa é software livre; você pode redistribuí-lo e/ou
+# modificá-lo sob os termos da Licença Pública Geral GNU,
+# conforme publicada pela Free Software Foundation; tanto a versão 3
+# da Licença, ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM NENHUMA GARANTIA; nem mesmo a garantia implícita de
+# COMERCIABILIDADE OU ADEQUAÇÃO A UM PROPÓSITO ESPECÍFICO. Consulte a
+# Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU
+# junto com este programa; se não, veja <https://www.gnu.org/licenses/>.
+
+"""Modelo da tabela de dados exibida na janela principal.
+
+Fica fora do pFillGapMain para que o NumPy e o pandas só sejam importados
+quando o primeiro arquivo de dados é aberto.
+"""
+
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from PyQt5.QtCore import Qt, QAbstractTableModel
+from PyQt5.QtGui import QColor
+
+# Tamanho dos blocos de células formatadas guardados em cache e número máximo de blocos
+BLOCO_LINHAS = 256
+BLOCO_COLUNAS = 16
+MAX_BLOCOS = 512
+
+
+def _formatarColuna(valores):
+    """Textos exibidos para um trecho de coluna, como f"{value:.3f}" / str(value)"""
+    if valores.dtype == np.float64:
+        return np.char.mod("%.3f", valores).tolist()
+    if valores.dtype == object:
+        return [f"{v:.3f}" if isinstance(v, (int, float)) else str(v) for v in valores]
+    return [str(v) for v in valores]
+
+
+def _mascaraNaN(colunas, nLinhas):
+    """Células NaN empacotadas em bits (linhas x ceil(colunas / 8))"""
+    mascara = np.zeros((nLinhas, (len(colunas) + 7) // 8), dtype=np.uint8)
+    for inicio in range(0, len(colunas), 8):
+        grupo = np.zeros((nLinhas, 8), dtype=bool)
+        for k, valores in enumerate(colunas[inicio:inicio + 8]):
+            grupo[:, k] = pd.isna(valores)
+        mascara[:, inicio // 8] = np.packbits(grupo, axis=1)[:, 0]
+    return mascara
+
+
+# Subclasse de QAbstractTableModel para usar o DataFrame
+class PandasModel(QAbstractTableModel):
+    """Modelo da tabela sobre os arrays NumPy de cada coluna do DataFrame.
+
+    Os textos são formatados por blocos, sob demanda, e guardados num cache;
+    as células originalmente NaN ficam numa máscara de bits.
+    """
+
+    def __init__(self, data):
+        super(PandasModel, self).__init__()
+        self._carregar(data)
+        # Armazena as localizações das células originalmente NaN
+        self._nan_locations = _mascaraNaN(self._colunas, self._nLinhas)
+
+    def _carregar(self, data):
+        # Colunas numéricas do DataFrame são vistas, sem cópia
+        self._colunas = [data.iloc[:, j].to_numpy() for j in range(data.shape[1])]
+        self._nomesColunas = [str(c) for c in data.columns]
+        self._index = data.index
+        self._nLinhas = data.shape[0]
+        self._cache = OrderedDict()
+
+    def rowCount(self, parent=None):
+        return self._nLinhas
+
+    def columnCount(self, parent=None):
+        return len(self._colunas)
+
+    def _texto(self, row, col):
+        chave = (row // BLOCO_LINHAS, col // BLOCO_COLUNAS)
+        bloco = self._cache.get(chave)
+        if bloco is None:
+            r0, c0 = chave[0] * BLOCO_LINHAS, chave[1] * BLOCO_COLUNAS
+            bloco = [_formatarColuna(valores[r0:r0 + BLOCO_LINHAS])
+                     for valores in self._colunas[c0:c0 + BLOCO_COLUNAS]]
+            self._cache[chave] = bloco
+            if len(self._cache) > MAX_BLOCOS:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(chave)
+        return bloco[col % BLOCO_COLUNAS][row % BLOCO_LINHAS]
+
+    def _eraNaN(self, row, col):
+        return (self._nan_locations[row, col >> 3] >> (7 - (col & 7))) & 1
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        # Centralizar o texto na célula
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        # Exibir o valor formatado em três casas decimais, se for um número
+        if role == Qt.DisplayRole:
+            return self._texto(index.row(), index.column())
+        # Verificar a localização original de NaN e aplicar destaque
+        if role == Qt.BackgroundRole and self._eraNaN(index.row(), index.column()):
+            return QColor(140, 200, 255)  # Azul claro para células originalmente NaN
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole:
+            if orientation == Qt.Horizontal:
+                return self._nomesColunas[section]
+            elif orientation == Qt.Vertical:
+                return str(self._index[section])
+        return None
+
+    def update_data(self, new_data):
+        """Atualiza os dados do modelo e mantém as localizações originais de NaN.
+
+        Com o mesmo formato de tabela, só as faixas de linhas que tinham NaN
+        em cada coluna são sinalizadas como alteradas.
+        """
+        if list(map(str, new_data.columns)) != self._nomesColunas or new_data.shape[0] != self._nLinhas:
+            self.beginResetModel()
+            self._carregar(new_data)
+            # Não altere `self._nan_locations` para que o destaque seja preservado
+            self.endResetModel()
+            return
+        self._carregar(new_data)
+        self.headerDataChanged.emit(Qt.Vertical, 0, max(self._nLinhas - 1, 0))
+        nanColunas = np.unpackbits(np.bitwise_or.reduce(self._nan_locations, axis=0))[:len(self._colunas)]
+        for col in np.flatnonzero(nanColunas):
+            linhas = np.flatnonzero((self._nan_locations[:, col >> 3] >> (7 - (col & 7))) & 1)
+            self.dataChanged.emit(self.index(int(linhas[0]), int(col)),
+                                  self.index(int(linhas[-1]), int(col)), [Qt.DisplayRole])
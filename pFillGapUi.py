@@ -0,0 +1,87 @@
+# pFillGaps
+# Copyright (C) [2024] [Cláudio Bielenki Jr]
+#
+# Este programa é software livre; você pode redistribuí-lo e/ou
+# modificá-lo sob os termos da Licença Pública Geral GNU,
+# conforme publicada pela Free Software Foundation; tanto a versão 3
+# da Licença, ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM NENHUMA GARANTIA; nem mesmo a garantia implícita de
+# COMERCIABILIDADE OU ADEQUAÇÃO A UM PROPÓSITO ESPECÍFICO. Consulte a
+# Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU
+# junto com este programa; se não, veja <https://www.gnu.org/licenses/>.
+
+"""Formulários do Qt Designer compilados para Python no build.
+
+`python pFillGapUi.py` gera ui_<nome>.py para cada .ui da pasta (e o
+resources_rc.py a partir do resources.qrc), evitando o parse do XML a cada
+abertura do programa. Sem o módulo compilado, ou com o .ui mais novo que
+ele, o formulário é carregado do .ui com uic.loadUiType, como antes.
+"""
+
+import importlib
+import os
+import sys
+from pathlib import Path
+
+PASTA = Path(__file__).resolve().parent
+FORMULARIOS = ("mainFillGaps.ui", "pFillGapDialog.ui", "creditos.ui")
+
+
+def moduloCompilado(arquivoUi):
+    """Módulo Python gerado para o .ui (ui_<nome>.py, na mesma pasta)"""
+    arquivoUi = Path(arquivoUi)
+    return arquivoUi.with_name("ui_" + arquivoUi.stem + ".py")
+
+
+def formulario(nomeUi):
+    """Classe do formulário `nomeUi`, do módulo compilado quando atualizado"""
+    arquivoUi = PASTA / nomeUi
+    modulo = moduloCompilado(arquivoUi)
+    # No executável congelado só existe o módulo compilado
+    if getattr(sys, 'frozen', False) or not arquivoUi.exists() or (
+            modulo.exists() and modulo.stat().st_mtime >= arquivoUi.stat().st_mtime):
+        try:
+            compilado = importlib.import_module(modulo.stem)
+        except ImportError:
+            pass
+        else:
+            return next(getattr(compilado, nome) for nome in dir(compilado)
+                        if nome.startswith("Ui_"))
+    from PyQt5 import uic
+    formClass, _ = uic.loadUiType(str(arquivoUi))
+    return formClass
+
+
+def compilar(pasta=PASTA):
+    """Gera ui_<nome>.py para os formulários e resources_rc.py; retorna os arquivos"""
+    from PyQt5 import uic
+    gerados = []
+    for nomeUi in FORMULARIOS:
+        arquivoUi = Path(pasta) / nomeUi
+        modulo = moduloCompilado(arquivoUi)
+        with open(modulo, "w", encoding="utf-8") as file:
+            uic.compileUi(str(arquivoUi), file)
+        gerados.append(modulo)
+    qrc = Path(pasta) / "resources.qrc"
+    if qrc.exists():
+        from PyQt5.pyrcc_main import processResourceFile
+        recursos = Path(pasta) / "resources_rc.py"
+        # processResourceFile resolve os caminhos do .qrc a partir da pasta atual
+        atual = os.getcwd()
+        os.chdir(pasta)
+        try:
+            if not processResourceFile([qrc.name], recursos.name, False):
+                raise RuntimeError(f"Falha ao compilar {qrc}")
+        finally:
+            os.chdir(atual)
+        gerados.append(recursos)
+    return gerados
+
+
+if __name__ == "__main__":
+    for arquivo in compilar():
+        print(f"Gerado {arquivo}")
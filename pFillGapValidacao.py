@@ -0,0 +1,198 @@
+# pFillGaps
+# Copyright (C) [2024] [Cláudio Bielenki Jr]
+#
+# Este programa é software livre; você pode redistribuí-lo e/ou
+# modificá-lo sob os termos da Licença Pública Geral GNU,
+# conforme publicada pela Free Software Foundation; tanto a versão 3
+# da Licença, ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM NENHUMA GARANTIA; nem mesmo a garantia implícita de
+# COMERCIABILIDADE OU ADEQUAÇÃO A UM PROPÓSITO ESPECÍFICO. Consulte a
+# Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU
+# junto com este programa; se não, veja <https://www.gnu.org/licenses/>.
+
+"""Validação cruzada dos parâmetros de preenchimento.
+
+Uma amostra dos valores observados é ocultada e estimada para todas as
+combinações de método, raio e número máximo de postos. Estatísticas,
+vizinhos e o ranking de doadores de cada raio são calculados uma vez; a
+seleção dos doadores de cada falha oculta é feita uma vez por raio com o
+maior número de postos da grade, e as seleções menores são os últimos
+doadores dessa lista, como no preenchimento normal. Os erros (estimado - observado) são resumidos por
+combinação e por posto.
+
+Exemplo:
+    python pFillGapValidacao.py chuva.csv postos.shp --code Codigo \
+        --distances 25000 50000 100000 --max-gauges 3 5 8 --output validacao.csv
+"""
+
+import argparse
+import sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from pFillGapCore import (METODOS, RankingDoadores, _candidatos, _estimarBloco,
+                          _selecionarDoadores, coordenadasPostos, lerPostos, mediasDesvios,
+                          pesosDistancia)
+from pFillGapIO import lerDados
+from pFillGapProfile import etapa
+from pFillGapSpatial import VizinhancaPostos
+from pFillGapStats import correlacaoPareada
+
+
+def ocultarAmostra(arrayData, fracao=0.1, seed=0):
+    """Linhas e colunas de uma amostra aleatória dos valores observados"""
+    linhas, colunas = np.nonzero(~np.isnan(arrayData))
+    rng = np.random.default_rng(seed)
+    escolhidos = np.sort(rng.choice(linhas.size, size=int(round(fracao * linhas.size)),
+                                    replace=False))
+    return linhas[escolhidos], colunas[escolhidos]
+
+
+def _limitarDoadores(doadores, estValidas, maxEst):
+    """Doadores da seleção com `maxEst` postos a partir da seleção com mais postos"""
+    novasValidas = np.minimum(estValidas, maxEst)
+    deslocamento = np.arange(maxEst)[None, :] + (estValidas - novasValidas)[:, None]
+    limitados = np.take_along_axis(doadores, np.minimum(deslocamento, doadores.shape[1] - 1),
+                                   axis=1)
+    limitados[np.arange(maxEst)[None, :] >= novasValidas[:, None]] = -1
+    return limitados, novasValidas
+
+
+def _metricas(erros):
+    validos = erros[~np.isnan(erros)]
+    if not validos.size:
+        return {"n": 0, "nao_preenchidas": int(erros.size), "rmse": np.nan, "mae": np.nan,
+                "bias": np.nan}
+    return {"n": int(validos.size), "nao_preenchidas": int(erros.size - validos.size),
+            "rmse": float(np.sqrt(np.mean(validos * validos))),
+            "mae": float(np.mean(np.abs(validos))), "bias": float(np.mean(validos))}
+
+
+def validacaoCruzada(dataPlu, vizinhos, metodos=METODOS, distancias=(), maxEsts=(), fracao=0.1,
+                     seed=0, blockSize=4096, minSobreposicao=2):
+    """Erros de estimativa da amostra oculta para cada (método, raio, maxEst).
+
+    `dataPlu` tem os postos nas colunas; `vizinhos` é a VizinhancaPostos dos
+    postos ou a matriz densa de distâncias, na ordem das colunas. Médias,
+    desvios e correlações são calculados uma única vez, já sem os valores
+    ocultos (pares com menos de `minSobreposicao` linhas comuns não são
+    doadores). Retorna dois DataFrames: o
+    resumo por combinação e os erros por posto, com n, falhas não
+    preenchidas, RMSE, MAE e viés.
+    """
+    for method in metodos:
+        if method not in METODOS:
+            raise ValueError(f"Método desconhecido: {method}")
+    distancias = sorted(distancias)
+    maxEsts = sorted(int(k) for k in maxEsts)
+    if not distancias or not maxEsts:
+        raise ValueError("Informe ao menos um raio e um número de postos")
+    arrayData = dataPlu.to_numpy(dtype=float)
+    nEst = arrayData.shape[1]
+    if not isinstance(vizinhos, VizinhancaPostos):
+        vizinhos = np.asarray(vizinhos, dtype=float)
+    nVizinhos = vizinhos.nEst if isinstance(vizinhos, VizinhancaPostos) else vizinhos.shape[0]
+    if nVizinhos != nEst:
+        raise ValueError(f"{nVizinhos} postos com coordenadas para {nEst} postos nos dados")
+    maxEsts = sorted({max(1, min(k, nEst)) for k in maxEsts})
+    kMax = maxEsts[-1]
+    ocultasRows, ocultasCols = ocultarAmostra(arrayData, fracao, seed)
+    observados = arrayData[ocultasRows, ocultasCols]
+    arrayData = arrayData.copy()
+    arrayData[ocultasRows, ocultasCols] = np.nan
+    with etapa("estatisticas"):
+        means, stds = (s.to_numpy(dtype=float) for s in
+                       mediasDesvios(pd.DataFrame(arrayData, columns=dataPlu.columns, copy=False)))
+        arrayCorr, _ = correlacaoPareada(arrayData, minSobreposicao=minSobreposicao)
+    # estimativas[(method, distancia, maxEst)] = valores na ordem das células ocultas
+    estimativas = {(method, distancia, k): np.full(observados.size, np.nan)
+                   for method in metodos for distancia in distancias for k in maxEsts}
+    # Células ocultas agrupadas por posto
+    ordem = np.argsort(ocultasCols, kind="stable")
+    limites = np.searchsorted(ocultasCols[ordem], np.arange(nEst + 1))
+    for distancia in distancias:
+        with etapa("vizinhos"):
+            if isinstance(vizinhos, VizinhancaPostos):
+                pesos = vizinhos.raio(distancia)
+            else:
+                pesos = pesosDistancia(vizinhos, distancia)
+        with etapa("ranking"):
+            ranking = RankingDoadores.calcular(arrayCorr, pesos)
+        with etapa("estimativas"):
+            for col in range(nEst):
+                celulas = ordem[limites[col]:limites[col + 1]]
+                candidatos, distCol = _candidatos(pesos, col)
+                if not celulas.size or not candidatos.size:
+                    continue
+                corrCol = arrayCorr[col, candidatos]
+                for inicio in range(0, celulas.size, blockSize):
+                    bloco = celulas[inicio:inicio + blockSize]
+                    dataBloco = arrayData[np.ix_(ocultasRows[bloco], candidatos)]
+                    # Seleção única com o maior maxEst, reduzida para os demais
+                    doadoresMax, validasMax = _selecionarDoadores(dataBloco, ranking.doPosto(col),
+                                                                  kMax)
+                    for k in maxEsts:
+                        doadores, estValidas = _limitarDoadores(doadoresMax, validasMax, k)
+                        for method in metodos:
+                            precX = _estimarBloco(dataBloco, doadores, estValidas, corrCol,
+                                                  distCol, means[candidatos], stds[candidatos],
+                                                  means[col], stds[col], method)
+                            estimativas[(method, distancia, k)][bloco] = np.where(
+                                estValidas > 0, precX, np.nan)
+    estacoes = [str(c) for c in dataPlu.columns]
+    resumo, porPosto = [], []
+    for (method, distancia, k), estimado in estimativas.items():
+        erros = estimado - observados
+        resumo.append({"method": method, "distance": distancia, "max_gauges": k,
+                       **_metricas(erros)})
+        for col in range(nEst):
+            celulas = ordem[limites[col]:limites[col + 1]]
+            porPosto.append({"method": method, "distance": distancia, "max_gauges": k,
+                             "station": estacoes[col], **_metricas(erros[celulas])})
+    chaves = ["method", "distance", "max_gauges"]
+    resumo = pd.DataFrame(resumo).sort_values("rmse", kind="stable").reset_index(drop=True)
+    porPosto = pd.DataFrame(porPosto).set_index(chaves + ["station"]).sort_index()
+    return resumo, porPosto
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="pFillGapValidacao",
+                                     description="Validação cruzada dos parâmetros de preenchimento")
+    parser.add_argument("csv", help="séries em CSV, Parquet, Feather ou .npy (postos nas colunas)")
+    parser.add_argument("shp", help="shapefile de pontos com os postos")
+    parser.add_argument("--date", help="coluna de datas do CSV (padrão: primeira coluna)")
+    parser.add_argument("--code", help="campo com o código dos postos no shapefile")
+    parser.add_argument("--methods", nargs="+", choices=METODOS, default=list(METODOS))
+    parser.add_argument("--distances", type=float, nargs="+", required=True,
+                        help="raios de busca avaliados, em metros")
+    parser.add_argument("--max-gauges", type=int, nargs="+", required=True,
+                        help="números máximos de postos avaliados")
+    parser.add_argument("--fraction", type=float, default=0.1,
+                        help="fração dos valores observados ocultada (padrão: 0.1)")
+    parser.add_argument("--seed", type=int, default=0, help="semente da amostra ocultada")
+    parser.add_argument("--output", help="CSV com o resumo; os erros por posto vão em "
+                                         "<saída>_postos.csv (padrão: <entrada>_validacao.csv)")
+    args = parser.parse_args(argv)
+
+    dataPlu = lerDados(args.csv)
+    dataPlu.set_index(args.date or dataPlu.columns[0], inplace=True)
+    postos = lerPostos(args.shp, args.code)
+    # Sem FillGapsEngine.fit: as estatísticas são calculadas só sem os valores ocultos
+    vizinhos = VizinhancaPostos(coordenadasPostos(postos, dataPlu.columns))
+    resumo, porPosto = validacaoCruzada(dataPlu, vizinhos, args.methods, args.distances,
+                                        args.max_gauges, fracao=args.fraction, seed=args.seed)
+    fileCSV = Path(args.csv)
+    saida = Path(args.output or fileCSV.with_name(fileCSV.stem + "_validacao.csv"))
+    resumo.to_csv(saida, index=False)
+    porPosto.to_csv(saida.with_name(saida.stem + "_postos.csv"))
+    print(resumo.head(10).to_string(index=False))
+    print(f"Resultados gravados em {saida} e {saida.with_name(saida.stem + '_postos.csv')}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# pFillGaps
+# Copyright (C) [2024] [Cláudio Bielenki Jr]
+#
+# Este programa é software livre; você pode redistribuí-lo e/ou
+# modificá-lo sob os termos da Licença Pública Geral GNU,
+# conforme publicada pela Free Software Foundation; tanto a versão 3
+# da Licença, ou (a seu critério) qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM NENHUMA GARANTIA; nem mesmo a garantia implícita de
+# COMERCIABILIDADE OU ADEQUAÇÃO A UM PROPÓSITO ESPECÍFICO. Consulte a
+# Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da Licença Pública Geral GNU
+# junto com este programa; se não, veja <https://www.gnu.org/licenses/>.
+
+import time
+import traceback
+from PyQt5.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+
+# Intervalo mínimo, em segundos, entre dois avisos de progresso para a interface
+INTERVALO_PROGRESSO = 0.1
+
+
+class TarefaPreenchimento(QObject):
+    """Executa `funcao` numa QThread e informa progresso, resultado ou erro.
+
+    Com `comProgresso`, `funcao` recebe o argumento `progresso(feitas, total)`
+    de pFillGapCore.preencherFalhas; é por ele que a tarefa é cancelada.
+    """
+    progresso = pyqtSignal(int, int, float)  # feitas, total, segundos restantes (-1 se desconhecido)
+    concluido = pyqtSignal(object)
+    falhou = pyqtSignal(str)
+    cancelado = pyqtSignal()
+
+    def __init__(self, funcao, *args, comProgresso=False, **kwargs):
+        super(TarefaPreenchimento, self).__init__()
+        self._funcao = funcao
+        self._args = args
+        self._kwargs = kwargs
+        self._comProgresso = comProgresso
+        self._cancelar = False
+        self._inicio = None
+        self._ultimoAviso = 0.0
+        self.qthread = None
+
+    def iniciar(self, aoTerminar=None):
+        """Move a tarefa para uma nova QThread e a inicia
+
+        `aoTerminar` é ligado ao QThread.finished antes do início da thread.
+        """
+        self.qthread = QThread()
+        self.moveToThread(self.qthread)
+        self.qthread.started.connect(self.executar)
+        for sinal in (self.concluido, self.falhou, self.cancelado):
+            sinal.connect(self.qthread.quit)
+        # A thread é liberada com a tarefa, por quem a guarda até qthread.finished
+        if aoTerminar is not None:
+            self.qthread.finished.connect(aoTerminar)
+        self.qthread.start()
+
+    def cancelar(self):
+        # Lido pela própria thread de trabalho no próximo aviso de progresso
+        self._cancelar = True
+
+    def _avisar(self, feitas, total):
+        if self._cancelar:
+            from pFillGapCore import PreenchimentoCancelado
+            raise PreenchimentoCancelado()
+        agora = time.perf_counter()
+        if agora - self._ultimoAviso < INTERVALO_PROGRESSO and feitas < total:
+            return
+        self._ultimoAviso = agora
+        decorrido = agora - self._inicio
+        restante = decorrido * (total - feitas) / feitas if feitas else -1.0
+        self.progresso.emit(int(feitas), int(total), float(restante))
+
+    @pyqtSlot()
+    def executar(self):
+        # Importado aqui para não carregar NumPy/pandas na abertura do programa
+        from pFillGapCore import PreenchimentoCancelado
+        self._inicio = time.perf_counter()
+        kwargs = dict(self._kwargs)
+        if self._comProgresso:
+            kwargs["progresso"] = self._avisar
+        try:
+            resultado = self._funcao(*self._args, **kwargs)
+        except PreenchimentoCancelado:
+            self.cancelado.emit()
+        except Exception as erro:
+            traceback.print_exc()
+            self.falhou.emit(str(erro))
+        else:
+            self.concluido.emit(resultado)
+
+
+def formatarTempo(segundos):
+    """Texto hh:mm:ss para o tempo restante estimado"""
+    if segundos < 0:
+        return "--:--:--"
+    segundos = int(round(segundos))
+    return f"{segundos // 3600:02d}:{segundos // 60 % 60:02d}:{segundos % 60:02d}"